@@ -1,22 +1,69 @@
 # agents/__init__.py
 
-from .grammar_tool import Grammar_Checking
+import os
+import time
+from loguru import logger
+
+from .grammar_tool import Grammar_Checking, DATA_DIR
 from .cv_recommender_agent import CVRecommenderAgent
 from .text_anonymizer import Text_anonymizer
 from .pdf_text_agent import PDFTextAgent
+from .docx_text_agent import DOCXTextAgent
+from .document_text_agent import DocumentTextAgent
+from .guideline_store import guideline_pdfs
+from .pipeline import DEFAULT_STAGES, Pipeline, Stage
+from .incremental_review import IncrementalCVReview
+from . import settings
 class AgentManager:
-    def __init__(self, max_retries=2, verbose=True):
-        path = "/Users/senghok/Documents/PathwayAgent/guideline/guideline_cv_2021.pdf"
-        
-        self.agents = {
-            "grammar_checker": Grammar_Checking(max_retries=max_retries, verbose=verbose),
-            "cv_recommender" : CVRecommenderAgent(guideline_pdf_path=path ,max_retries= max_retries, verbose= verbose),
-            "text_anonymizer": Text_anonymizer()
+    def __init__(self, max_retries=2, verbose=True, warm_up=True, guideline_dir=None):
+        guideline_dir = guideline_dir or settings.GUIDELINE_DIR
+        guideline_paths = guideline_pdfs(guideline_dir)
+        if not guideline_paths:
+            raise ValueError(f"No guideline PDFs found in '{guideline_dir}'. Set PATHWAY_GUIDELINE_DIR.")
+        self.watched_files = [
+            guideline_dir,
+            *guideline_paths,
+            os.path.join(DATA_DIR, "district.txt"),
+            os.path.join(DATA_DIR, "commune.txt"),
+        ]
+        self.build_timings = {}
+        self.pipelines = {}
+
+        factories = {
+            "grammar_checker": lambda: Grammar_Checking(max_retries=max_retries, verbose=verbose),
+            "cv_recommender" : lambda: CVRecommenderAgent(guideline_pdf_path=guideline_paths ,max_retries= max_retries, verbose= verbose),
+            "text_anonymizer": lambda: Text_anonymizer()
 
         }
+        self.agents = {}
+        for agent_name, factory in factories.items():
+            start = time.perf_counter()
+            self.agents[agent_name] = factory()
+            self.build_timings[agent_name] = time.perf_counter() - start
+            logger.info(f"[AgentManager] Built '{agent_name}' in {self.build_timings[agent_name]:.3f}s")
+
+        if warm_up:
+            for agent_name, agent in self.agents.items():
+                if hasattr(agent, "warm_up"):
+                    start = time.perf_counter()
+                    agent.warm_up()
+                    self.build_timings[f"{agent_name}.warm_up"] = time.perf_counter() - start
 
     def get_agent(self, agent_name):
         agent = self.agents.get(agent_name)
         if not agent:
             raise ValueError(f"Agent '{agent_name}' not found.")
-        return agent
\ No newline at end of file
+        return agent
+
+    def get_pipeline(self, stages=DEFAULT_STAGES):
+        """Shared Pipeline over these agents, so its stage cache survives Streamlit reruns."""
+        stages = tuple(stages)
+        if stages not in self.pipelines:
+            self.pipelines[stages] = Pipeline.from_manager(self, stages)
+        return self.pipelines[stages]
+
+
+from .agent_base import set_llm_concurrency
+from .agent_registry import get_agent_manager, invalidate_agent_manager, startup_report
+from .response_cache import default_response_cache
+from .telemetry import default_telemetry
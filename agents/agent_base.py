@@ -1,53 +1,555 @@
 import openai 
+from openai.types.chat import ChatCompletionMessage
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from loguru import logger
+import asyncio
+import contextvars
+import functools
 import os
+import threading
+import time
+import weakref
+from collections import deque
 from dotenv import load_dotenv
 
+from . import settings
+from .settings import MODEL
+from .prompt_builder import prompt_report
+from .response_cache import default_response_cache, make_cache_key
+from .retry_policy import RetryPolicy, CircuitOpenError, default_circuit_breaker
+from .telemetry import default_telemetry
+
 load_dotenv()
 
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# Retries are handled by AgentBase's RetryPolicy, so the SDK's own retry loop is disabled.
+_sync_client = None
+
+# The async client and the concurrency semaphore are tied to an event loop, so keep one per loop.
+_async_clients = weakref.WeakKeyDictionary()
+_llm_semaphores = weakref.WeakKeyDictionary()
+
+
+def _get_sync_client():
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = openai.OpenAI(api_key=openai.api_key, max_retries=0)
+    return _sync_client
+
+
+def _get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = openai.AsyncOpenAI(api_key=openai.api_key, max_retries=0)
+        _async_clients[loop] = client
+    return client
+
+
+def llm_semaphore():
+    """Semaphore bounding concurrent async LLM requests on the running loop."""
+    loop = asyncio.get_running_loop()
+    sem = _llm_semaphores.get(loop)
+    if sem is None:
+        sem = asyncio.Semaphore(settings.LLM_CONCURRENCY)
+        _llm_semaphores[loop] = sem
+    return sem
+
+
+def set_llm_concurrency(limit):
+    """Change the async LLM concurrency limit; applies to semaphores created afterwards."""
+    if limit < 1:
+        raise ValueError("LLM concurrency limit must be at least 1.")
+    settings.LLM_CONCURRENCY = limit
+    _llm_semaphores.clear()
+
+
+_prompt_collector = contextvars.ContextVar("prompt_collector", default=None)
+
+
+@contextmanager
+def collect_prompt_reports():
+    """Yields a list receiving the prompt report of every call made in this context."""
+    reports = []
+    token = _prompt_collector.set(reports)
+    try:
+        yield reports
+    finally:
+        _prompt_collector.reset(token)
+
+
+def in_context(fn):
+    """``fn`` bound to a copy of the current context, for one ThreadPoolExecutor task."""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+class _Flight:
+    """One in-flight request; identical calls made meanwhile wait for its reply."""
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.done = threading.Event()
+        self.reply = None
+        self.error = None
+        self._async_waiters = []
+
+    def land(self, reply=None, error=None):
+        with _flights_lock:
+            self.reply, self.error = reply, error
+            self.done.set()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    async def wait(self):
+        future = asyncio.get_running_loop().create_future()
+        with _flights_lock:
+            if self.done.is_set():
+                return
+            self._async_waiters.append((asyncio.get_running_loop(), future))
+        await future
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+# Request key -> _Flight, shared by every agent, thread and event loop in the process.
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _take_off(key):
+    """(flight, leader): the caller either leads a new flight or follows the one in the air."""
+    if key is None:
+        return None, True
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = _flights[key] = _Flight()
+        return flight, True
+
+
+def _land(key, flight, reply=None, error=None):
+    """End a flight. Landing without reply or error (cancelled, abandoned stream) lets followers retry."""
+    if flight is None:
+        return
+    with _flights_lock:
+        if _flights.get(key) is flight:
+            del _flights[key]
+    flight.land(reply, error)
+
+
+def _format_kwargs(response_format):
+    # Omitted entirely when unset, so plain calls send exactly what they did before.
+    return {"response_format": response_format} if response_format else {}
+
+
 class AgentBase(ABC):
-    def __init__(self,name, max_retries = 2, verbose = True):
+    # False for agents that read un-anonymized text: their replies are cached in memory, never on disk.
+    persist_responses = True
+
+    def __init__(self,name, max_retries = 2, verbose = True, cache = None,
+                 retry_policy = None, circuit_breaker = None, telemetry = None):
         self.name = name
         self.max_retries = max_retries
         self.verbose = verbose
+        self._cache = cache
+        self.retry_policy = retry_policy or RetryPolicy(timeout=settings.LLM_TIMEOUT)
+        self.circuit_breaker = circuit_breaker or default_circuit_breaker()
+        self.telemetry = telemetry or default_telemetry()
+        # Per-attempt outcomes: the latest call, plus a bounded history for tuning the policy.
+        self.last_attempts = []
+        self.attempt_history = deque(maxlen=500)
+        # Static vs. dynamic prompt tokens and provider-cached tokens, per call.
+        self.prompt_reports = deque(maxlen=500)
     def execute(self,*args, **kwargs):
         pass
+
+    @property
+    def cache(self):
+        """Response cache for this agent; defaults to the process-wide one."""
+        if self._cache is None:
+            self._cache = default_response_cache()
+        return self._cache
     
-    def call_openai(self, messages, temperature = 0.7, max_tokens = 150):
+    def _request_key(self, messages, temperature, max_tokens, response_format=None):
+        # Only structured calls key on the format, so plain-text keys stay as they were.
+        extra = {"response_format": response_format} if response_format else {}
+        return make_cache_key(MODEL, messages, temperature, max_tokens, **extra)
+
+    def _cache_lookup(self, messages, temperature, max_tokens, use_cache, response_format=None):
+        """Returns (cache_key, cached_reply); cache_key is None when caching is off for this call."""
+        cache = self.cache if use_cache else None
+        if cache is None:
+            return None, None
+        cache_key = self._request_key(messages, temperature, max_tokens, response_format)
+        return cache_key, self._cache_fetch(cache_key)
+
+    def _cache_fetch(self, cache_key):
+        cached = self.cache.get(cache_key) if cache_key is not None else None
+        if cached is None:
+            return None
+        if self.verbose:
+            logger.info(f"[{self.name}] Cache hit {cache_key[:12]}")
+        return ChatCompletionMessage.model_validate(cached)
+
+    def _recheck_cache(self, key, flight, cache_key, messages):
+        """A new leader looks again: an identical call may have landed since the first lookup."""
+        if flight is None:
+            return None
+        cached = self._cache_fetch(cache_key)
+        if cached is not None:
+            self._on_cache_hit(messages)
+            _land(key, flight, cached)
+        return cached
+
+    def _cache_store(self, cache_key, reply):
+        if cache_key is not None:
+            self.cache.set(cache_key, reply.model_dump(exclude_none=True), persist=self.persist_responses)
+
+    def _record_prompt(self, messages, usage=None, source="api"):
+        report = {"agent": self.name, **prompt_report(messages, usage, source)}
+        self.prompt_reports.append(report)
+        collector = _prompt_collector.get()
+        if collector is not None:
+            collector.append(report)
+        if self.verbose and source == "api":
+            logger.info(f"[{self.name}] Prompt tokens: {report['static_tokens']} static + "
+                        f"{report['dynamic_tokens']} dynamic, {report['cached_tokens']} cached by provider")
+        return report
+
+    def _on_cache_hit(self, messages):
+        self._record_prompt(messages, source="response_cache")
+        self.telemetry.record(self.name, "cache_hit", 0.0, model=MODEL)
+
+    def _flight_key(self, cache_key, messages, temperature, max_tokens, use_cache, response_format):
+        """Key under which identical concurrent calls coalesce; None when this call must run on its own."""
+        if not use_cache or not settings.COALESCE_REQUESTS:
+            return None
+        return cache_key or self._request_key(messages, temperature, max_tokens, response_format)
+
+    def _follow(self, flight, messages):
+        """Wait for an identical in-flight request; its reply, or None if this call should run itself."""
+        if flight.thread == threading.get_ident():
+            # Led from this thread (an async call on this loop): blocking here would never return.
+            return None
+        start = time.perf_counter()
+        if not flight.done.wait(settings.LLM_TIMEOUT):
+            return None
+        return self._on_coalesced(flight, messages, time.perf_counter() - start)
+
+    async def _afollow(self, flight, messages):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(flight.wait(), settings.LLM_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        return self._on_coalesced(flight, messages, time.perf_counter() - start)
+
+    def _on_coalesced(self, flight, messages, waited):
+        if flight.error is not None:
+            raise flight.error
+        if flight.reply is None:
+            return None
+        self._record_prompt(messages, source="coalesced")
+        self.telemetry.record(self.name, "coalesced", waited, model=MODEL)
+        if self.verbose:
+            logger.info(f"[{self.name}] Shared an identical in-flight request after {waited:.2f}s")
+        return flight.reply.model_copy()
+
+    def _log_request(self, messages):
+        if self.verbose:
+            logger.info(f"[{self.name}] Sending messages to OpenAI:")
+            for msg in messages:
+                logger.debug(f" {msg['role']}: {msg['content']}")
+
+    def _before_attempt(self, attempt, attempts):
+        """Returns the circuit breaker's trial token, released when the attempt ends."""
+        try:
+            return self.circuit_breaker.before_call()
+        except CircuitOpenError as e:
+            self._record_attempt(attempts, attempt, "circuit_open", 0.0, error=e)
+            self._finish_attempts(attempts)
+            logger.error(f"[{self.name}] {e}")
+            raise
+
+    def _record_attempt(self, attempts, attempt, outcome, latency, error=None, delay=None, ttft=None):
+        record = {
+            "attempt": attempt,
+            "outcome": outcome,
+            "latency": latency,
+            "ttft": ttft,
+            "status_code": getattr(error, "status_code", None),
+            "error": f"{type(error).__name__}: {error}" if error is not None else None,
+            "delay": delay,
+        }
+        attempts.append(record)
+        self.attempt_history.append(record)
+
+    def _finish_attempts(self, attempts, report=None):
+        """End of a call: keep its attempts and send one record to telemetry."""
+        self.last_attempts = attempts
+        last = attempts[-1]
+        report = report or {}
+        self.telemetry.record(
+            self.name, last["outcome"],
+            latency=sum(a["latency"] + (a["delay"] or 0) for a in attempts),
+            retries=len(attempts) - 1,
+            ttft=last["ttft"],
+            prompt_tokens=report.get("prompt_tokens"),
+            completion_tokens=report.get("completion_tokens"),
+            cached_tokens=report.get("cached_tokens"),
+            model=MODEL,
+        )
+
+    def _on_success(self, attempt, latency, attempts, messages, usage=None, ttft=None):
+        self.circuit_breaker.record_success()
+        self._record_attempt(attempts, attempt, "ok", latency, ttft=ttft)
+        self._finish_attempts(attempts, self._record_prompt(messages, usage))
+
+    def _on_failure(self, exc, attempt, latency, attempts):
+        """Record a failed attempt; return the backoff delay, or raise if the call should stop."""
+        if not self.retry_policy.is_retryable(exc):
+            if isinstance(exc, openai.APIStatusError):
+                # The endpoint answered (e.g. 400/401), so it is up as far as the breaker is concerned.
+                self.circuit_breaker.record_success()
+            self._record_attempt(attempts, attempt, "fatal", latency, error=exc)
+            self._finish_attempts(attempts)
+            logger.error(f"[{self.name}] Non-retryable error during OpenAI call: {exc}")
+            raise exc
+        self.circuit_breaker.record_failure()
+        if attempt >= self.max_retries:
+            self._record_attempt(attempts, attempt, "exhausted", latency, error=exc)
+            self._finish_attempts(attempts)
+            logger.error(f"[{self.name}] Error during OpenAI call: {exc}. Retry {attempt}/{self.max_retries}")
+            raise Exception(f"[{self.name}] Failed to get response from OpenAI after {self.max_retries} retries.") from exc
+        delay = self.retry_policy.delay(attempt, exc)
+        self._record_attempt(attempts, attempt, "retry", latency, error=exc, delay=delay)
+        logger.error(f"[{self.name}] Error during OpenAI call: {exc}. Retry {attempt}/{self.max_retries} "
+                     f"in {delay:.2f}s")
+        return delay
+
+    def call_openai(self, messages, temperature = 0.7, max_tokens = 150, use_cache = True, stream = False,
+                    response_format = None):
         """Calls the openai model and retrieve the response
+        Set use_cache=False for calls that must not reuse an earlier completion.
+        Identical calls already in flight are waited on instead of sent again.
+        With stream=True a generator of text deltas is returned instead.
+        response_format is passed through to the API (e.g. a json_schema for structured output).
         Returns:
         str: The content of the model's response
         """
-        retries = 0
-        while retries < self.max_retries:
+        if stream:
+            return self._stream_openai(messages, temperature, max_tokens, use_cache, response_format)
+        cache_key, cached = self._cache_lookup(messages, temperature, max_tokens, use_cache, response_format)
+        if cached is not None:
+            self._on_cache_hit(messages)
+            return cached
+
+        key = self._flight_key(cache_key, messages, temperature, max_tokens, use_cache, response_format)
+        flight, leader = _take_off(key)
+        if not leader:
+            reply = self._follow(flight, messages)
+            if reply is not None:
+                return reply
+            flight = None
+        cached = self._recheck_cache(key, flight, cache_key, messages)
+        if cached is not None:
+            return cached
+        reply = error = None
+        try:
+            reply = self._complete(messages, temperature, max_tokens, cache_key, response_format)
+            return reply
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _land(key, flight, reply, error)
+
+    def _complete(self, messages, temperature, max_tokens, cache_key, response_format):
+        client = _get_sync_client()
+        attempts = []
+        for attempt in range(1, self.max_retries + 1):
+            trial = self._before_attempt(attempt, attempts)
             try:
+                self._log_request(messages)
+                start = time.perf_counter()
+                try:
+                    response = client.chat.completions.create(
+                        model = MODEL,
+                        messages = messages,
+                        temperature = temperature,
+                        max_tokens = max_tokens,
+                        timeout = self.retry_policy.timeout,
+                        **_format_kwargs(response_format)
+                    )
+                except Exception as e:
+                    time.sleep(self._on_failure(e, attempt, time.perf_counter() - start, attempts))
+                    continue
+                self._on_success(attempt, time.perf_counter() - start, attempts, messages, response.usage)
+                reply = response.choices[0].message
                 if self.verbose:
-                    logger.info(f"[{self.name}] Sending messages to OpenAI:")
-                    for msg in messages:
-                        logger.debug(f" {msg["role"]}: {msg["content"]}")
-                response = openai.chat.completions.create(
-                    model = "gpt-4.1-mini",
-                    messages = messages,
-                    temperature = temperature,
-                    max_tokens = max_tokens   
-                )
+                    logger.info(f"[{self.name}] Received Response: {reply}")
+                self._cache_store(cache_key, reply)
+                return reply
+            finally:
+                self.circuit_breaker.release(trial)
+
+        raise Exception(f"[{self.name}] Failed to get response from OpenAI after {self.max_retries} retries.")
+
+    def _stream_openai(self, messages, temperature, max_tokens, use_cache, response_format=None):
+        """Yield the completion as text deltas; only failures before the first token are retried."""
+        cache_key, cached = self._cache_lookup(messages, temperature, max_tokens, use_cache, response_format)
+        if cached is not None:
+            self._on_cache_hit(messages)
+            yield cached.content or ""
+            return
+
+        key = self._flight_key(cache_key, messages, temperature, max_tokens, use_cache, response_format)
+        flight, leader = _take_off(key)
+        if not leader:
+            # Following an identical call: the whole reply arrives as one delta when it lands.
+            reply = self._follow(flight, messages)
+            if reply is not None:
+                yield reply.content or ""
+                return
+            flight = None
+        cached = self._recheck_cache(key, flight, cache_key, messages)
+        if cached is not None:
+            yield cached.content or ""
+            return
+        reply = error = None
+        try:
+            reply = yield from self._stream_attempts(messages, temperature, max_tokens, cache_key, response_format)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # A stream closed early lands empty, so its followers send their own request.
+            _land(key, flight, reply, error)
+
+    def _stream_attempts(self, messages, temperature, max_tokens, cache_key, response_format):
+        client = _get_sync_client()
+        attempts = []
+        for attempt in range(1, self.max_retries + 1):
+            trial = self._before_attempt(attempt, attempts)
+            try:
+                self._log_request(messages)
+                start = time.perf_counter()
+                parts = []
+                ttft = None
+                usage = None
+                try:
+                    stream = client.chat.completions.create(
+                        model = MODEL,
+                        messages = messages,
+                        temperature = temperature,
+                        max_tokens = max_tokens,
+                        timeout = self.retry_policy.timeout,
+                        stream = True,
+                        stream_options = {"include_usage": True},
+                        **_format_kwargs(response_format)
+                    )
+                    for chunk in stream:
+                        # With include_usage the last chunk has no choices, only the usage totals.
+                        usage = getattr(chunk, "usage", None) or usage
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if not delta:
+                            continue
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                            if self.verbose:
+                                logger.info(f"[{self.name}] First token after {ttft:.2f}s")
+                        parts.append(delta)
+                        yield delta
+                except Exception as e:
+                    latency = time.perf_counter() - start
+                    if parts:
+                        self._record_attempt(attempts, attempt, "stream_error", latency, error=e, ttft=ttft)
+                        self._finish_attempts(attempts)
+                        logger.error(f"[{self.name}] Stream interrupted after {len(parts)} chunks: {e}")
+                        raise
+                    time.sleep(self._on_failure(e, attempt, latency, attempts))
+                    continue
+                latency = time.perf_counter() - start
+                self._on_success(attempt, latency, attempts, messages, usage, ttft=ttft)
+                reply = ChatCompletionMessage(role="assistant", content="".join(parts))
+                if self.verbose:
+                    logger.info(f"[{self.name}] Stream finished in {latency:.2f}s")
+                self._cache_store(cache_key, reply)
+                return reply
+            finally:
+                self.circuit_breaker.release(trial)
+
+        raise Exception(f"[{self.name}] Failed to get response from OpenAI after {self.max_retries} retries.")
+
+    async def acall_openai(self, messages, temperature = 0.7, max_tokens = 150, use_cache = True,
+                           response_format = None):
+        """Async counterpart of call_openai, bounded by llm_semaphore()."""
+        cache_key, cached = self._cache_lookup(messages, temperature, max_tokens, use_cache, response_format)
+        if cached is not None:
+            self._on_cache_hit(messages)
+            return cached
+
+        key = self._flight_key(cache_key, messages, temperature, max_tokens, use_cache, response_format)
+        flight, leader = _take_off(key)
+        if not leader:
+            reply = await self._afollow(flight, messages)
+            if reply is not None:
+                return reply
+            flight = None
+        cached = self._recheck_cache(key, flight, cache_key, messages)
+        if cached is not None:
+            return cached
+        reply = error = None
+        try:
+            reply = await self._acomplete(messages, temperature, max_tokens, cache_key, response_format)
+            return reply
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Cancellation lands empty, so followers send their own request.
+            _land(key, flight, reply, error)
+
+    async def _acomplete(self, messages, temperature, max_tokens, cache_key, response_format):
+        client = _get_async_client()
+        attempts = []
+        for attempt in range(1, self.max_retries + 1):
+            trial = self._before_attempt(attempt, attempts)
+            try:
+                self._log_request(messages)
+                async with llm_semaphore():
+                    start = time.perf_counter()
+                    try:
+                        response = await client.chat.completions.create(
+                            model = MODEL,
+                            messages = messages,
+                            temperature = temperature,
+                            max_tokens = max_tokens,
+                            timeout = self.retry_policy.timeout,
+                            **_format_kwargs(response_format)
+                        )
+                        error = None
+                    except Exception as e:
+                        error = e
+                    latency = time.perf_counter() - start
+                if error is not None:
+                    await asyncio.sleep(self._on_failure(error, attempt, latency, attempts))
+                    continue
+                self._on_success(attempt, latency, attempts, messages, response.usage)
                 reply = response.choices[0].message
                 if self.verbose:
                     logger.info(f"[{self.name}] Received Response: {reply}")
+                self._cache_store(cache_key, reply)
                 return reply
-            except Exception as e:
-                retries += 1
-                logger.error(f"[{self.name}] Error during OpenAI call: {e}. Retry {retries}/{self.max_retries}")
-        
+            finally:
+                self.circuit_breaker.release(trial)
+
         raise Exception(f"[{self.name}] Failed to get response from OpenAI after {self.max_retries} retries.")
-                
-        
-    
-    
-    
-    
-    
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from loguru import logger
+
+# One AgentManager per process, shared by every Streamlit session and rerun.
+_lock = threading.Lock()
+_manager = None
+_manager_key = None
+_fingerprint = None
+_stats = {
+    "builds": 0,
+    "lookups": 0,
+    "warm_lookups": 0,
+    "cold_start_seconds": None,
+    "agent_build_seconds": {},
+    "last_warm_lookup_seconds": None,
+    "last_invalidation_reason": None,
+}
+
+
+def _file_fingerprint(paths):
+    """(path, mtime_ns, size) for every watched file; missing files map to None.
+
+    A same-size edit within the filesystem's mtime granularity goes unnoticed.
+    """
+    fingerprint = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            fingerprint.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+
+def _build(key, max_retries, verbose, guideline_dir):
+    global _manager, _manager_key, _fingerprint
+    from . import AgentManager
+
+    start = time.perf_counter()
+    manager = AgentManager(max_retries=max_retries, verbose=verbose, guideline_dir=guideline_dir)
+    elapsed = time.perf_counter() - start
+
+    _manager = manager
+    _manager_key = key
+    _fingerprint = _file_fingerprint(manager.watched_files)
+    _stats["builds"] += 1
+    _stats["cold_start_seconds"] = elapsed
+    _stats["agent_build_seconds"] = dict(manager.build_timings)
+    logger.info(f"[AgentRegistry] AgentManager built in {elapsed:.3f}s (build #{_stats['builds']})")
+    return manager
+
+
+def get_agent_manager(max_retries=2, verbose=True, guideline_dir=None):
+    """Return the process-wide AgentManager, building it on first use.
+
+    The manager is rebuilt when the arguments change or when one of the
+    guideline / gazetteer files it was built from is modified on disk.
+    """
+    start = time.perf_counter()
+    key = (max_retries, verbose, guideline_dir)
+    with _lock:
+        manager = _manager
+        if manager is None:
+            reason = "cold start"
+        elif _manager_key != key:
+            reason = f"arguments changed {_manager_key} -> {key}"
+        elif _file_fingerprint(manager.watched_files) != _fingerprint:
+            reason = "watched files changed"
+        else:
+            reason = None
+
+        if reason is not None:
+            if manager is not None:
+                logger.info(f"[AgentRegistry] Rebuilding AgentManager: {reason}")
+                _stats["last_invalidation_reason"] = reason
+            manager = _build(key, max_retries, verbose, guideline_dir)
+
+        _stats["lookups"] += 1
+        if reason is None:
+            # Builds are reported as cold_start_seconds; only cache hits count as warm.
+            _stats["warm_lookups"] += 1
+            _stats["last_warm_lookup_seconds"] = time.perf_counter() - start
+    return manager
+
+
+def invalidate_agent_manager(reason="manual invalidation"):
+    """Drop the cached AgentManager so the next lookup rebuilds it."""
+    global _manager, _manager_key, _fingerprint
+    with _lock:
+        _manager = None
+        _manager_key = None
+        _fingerprint = None
+        _stats["last_invalidation_reason"] = reason
+    logger.info(f"[AgentRegistry] AgentManager invalidated: {reason}")
+
+
+def startup_report():
+    """Snapshot of cold-start and warm-lookup timings."""
+    with _lock:
+        report = dict(_stats)
+        report["agent_build_seconds"] = dict(_stats["agent_build_seconds"])
+    return report
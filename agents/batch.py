@@ -0,0 +1,198 @@
+"""Run the Grammar → Anonymize → Recommend pipeline over a directory of CVs.
+
+    python -m agents.batch datasets/raws/cv --out results.jsonl [--concurrency 4] [--workers 2]
+
+Documents run concurrently: model calls are bounded by ``--concurrency`` and
+extraction/anonymization run in a pool of ``--workers`` processes (0 keeps them
+in-process threads). Each finished document is appended to the output JSONL, so
+an interrupted run resumes where it stopped: documents whose path and content
+hash already have an ``ok`` record are skipped. Records hold the anonymized text
+and the recommendations.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+
+from . import AgentManager, settings
+from .agent_base import set_llm_concurrency
+from .document_text_agent import SUPPORTED_TYPES, DocumentTextAgent
+from .guideline_store import sha256_file
+from .pipeline import Pipeline, Stage
+from .telemetry import default_telemetry
+from .text_anonymizer import Text_anonymizer
+
+# Agents built lazily inside each pool worker process.
+_worker_agents = {}
+
+
+def _worker_agent(name, factory):
+    agent = _worker_agents.get(name)
+    if agent is None:
+        agent = _worker_agents[name] = factory()
+    return agent
+
+
+def _extract(path):
+    text = _worker_agent("extractor", DocumentTextAgent).extract_text(path)
+    if not text.strip():
+        raise ValueError("No extractable text.")
+    return text
+
+
+def _anonymize(text):
+    return _worker_agent("anonymizer", Text_anonymizer).execute(text)
+
+
+def discover(directory):
+    paths = []
+    for ext in SUPPORTED_TYPES:
+        paths.extend(glob.glob(os.path.join(directory, "**", f"*.{ext}"), recursive=True))
+    return sorted(paths)
+
+
+def load_checkpoint(out_path):
+    """(path, sha256) of documents that already have an ``ok`` record."""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from an interrupted run
+            if record.get("status") == "ok":
+                done.add((record["path"], record["sha256"]))
+    return done
+
+
+class BatchRunner:
+    def __init__(self, out_path, concurrency=None, workers=1, max_retries=2, guideline_dir=None):
+        self.out_path = out_path
+        self.concurrency = concurrency or settings.LLM_CONCURRENCY
+        self.workers = workers
+        set_llm_concurrency(self.concurrency)
+        # With worker processes the parent never anonymizes: it only needs the anonymizer's
+        # cache_version, so spaCy/Presidio are loaded in the workers alone.
+        self.manager = AgentManager(max_retries=max_retries, verbose=False, warm_up=workers == 0,
+                                    guideline_dir=guideline_dir)
+        self.counts = {"ok": 0, "error": 0, "skipped": 0}
+
+    def _pipeline(self, pool):
+        agent = self.manager.get_agent
+        if pool:
+            anonymize = Stage("anonymize", _anonymize, cpu_bound=True,
+                              version=agent("text_anonymizer").cache_version)
+        else:
+            anonymize = Stage.from_agent("anonymize", agent("text_anonymizer"))
+        stages = [
+            Stage("extract", _extract, cpu_bound=True, cache=False),
+            Stage.from_agent("grammar", agent("grammar_checker")),
+            anonymize,
+            Stage.from_agent("recommend", agent("cv_recommender")),
+        ]
+        # Enough documents in flight to keep both the model and the CPU pool busy.
+        return Pipeline(stages, executor=pool, max_in_flight=2 * max(self.concurrency, self.workers, 1))
+
+    def _record(self, path, digest, result):
+        record = {"path": path, "sha256": digest, "status": "ok" if result.ok else "error",
+                  "timings": {k: round(v, 4) for k, v in result.timings.items()}}
+        if result.ok:
+            record.update(anonymized=result.outputs["anonymize"], recommendations=result.outputs["recommend"])
+        else:
+            logger.error(f"[batch] {path} failed at {result.failed_stage}: {result.error}")
+            record.update(stage=result.failed_stage, error=str(result.error))
+        self.counts[record["status"]] += 1
+        return record
+
+    async def arun(self, paths):
+        done = load_checkpoint(self.out_path)
+        pending = []
+        for path in paths:
+            digest = sha256_file(path)
+            if (path, digest) in done:
+                self.counts["skipped"] += 1
+            else:
+                pending.append((path, digest))
+        logger.info(f"[batch] {len(pending)} to process, {self.counts['skipped']} already done.")
+
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 0 else None
+        pipeline = self._pipeline(pool)
+        with open(self.out_path, "a+", encoding="utf-8") as out:
+            out.seek(0, os.SEEK_END)
+            if out.tell():
+                out.seek(out.tell() - 1)
+                if out.read(1) != "\n":
+                    out.write("\n")
+
+            def on_result(index, result):
+                path, digest = pending[index]
+                out.write(json.dumps(self._record(path, digest, result), ensure_ascii=False) + "\n")
+                out.flush()
+
+            start = time.perf_counter()
+            try:
+                await pipeline.arun_many([p for p, _ in pending], on_result=on_result)
+            finally:
+                if pool:
+                    pool.shutdown()
+        return self.summary(time.perf_counter() - start, pipeline.report())
+
+    def run(self, paths):
+        return asyncio.run(self.arun(paths))
+
+    def summary(self, wall_seconds, report):
+        stages = {}
+        for stage, s in report.items():
+            stages[stage] = {
+                "count": s["calls"] - s["failures"],
+                "failures": s["failures"],
+                "mean_seconds": s["mean_seconds"],
+                "docs_per_minute": 60 * (s["calls"] - s["failures"]) / wall_seconds if wall_seconds else 0.0,
+            }
+        return {"wall_seconds": wall_seconds, "concurrency": self.concurrency, "workers": self.workers,
+                **self.counts, "stages": stages, "llm": default_telemetry().agent_summary()}
+
+
+def format_summary(summary):
+    lines = [
+        f"{summary['ok']} ok, {summary['error']} failed, {summary['skipped']} skipped in "
+        f"{summary['wall_seconds']:.1f}s (concurrency {summary['concurrency']}, workers {summary['workers']})",
+        f"{'stage':<10} {'docs':>5} {'failed':>7} {'mean s':>8} {'docs/min':>9}",
+    ]
+    for stage, s in summary["stages"].items():
+        lines.append(f"{stage:<10} {s['count']:>5} {s['failures']:>7} {s['mean_seconds']:>8.2f} "
+                     f"{s['docs_per_minute']:>9.1f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the CV pipeline over a directory of PDF/DOCX files.")
+    parser.add_argument("input_dir", help="Directory searched recursively for PDF and DOCX files.")
+    parser.add_argument("--out", default="batch_results.jsonl", help="JSONL results file; also the checkpoint.")
+    parser.add_argument("--concurrency", type=int, default=settings.LLM_CONCURRENCY,
+                        help="Maximum concurrent model requests.")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Processes for extraction and anonymization (0 = in-process threads).")
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--guideline-dir", default=None)
+    args = parser.parse_args()
+
+    paths = discover(args.input_dir)
+    if not paths:
+        raise SystemExit(f"No PDF or DOCX files found in {args.input_dir}")
+    runner = BatchRunner(args.out, concurrency=args.concurrency, workers=args.workers,
+                         max_retries=args.max_retries, guideline_dir=args.guideline_dir)
+    summary = runner.run(paths)
+    with open(os.path.splitext(args.out)[0] + ".summary.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(format_summary(summary))
+
+
+if __name__ == "__main__":
+    main()
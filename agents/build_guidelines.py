@@ -0,0 +1,35 @@
+"""Pre-build the cached guideline text artifacts and retrieval index.
+
+    python -m agents.build_guidelines [--dir guideline/] [--force]
+"""
+import argparse
+import time
+
+from .guideline_store import guideline_pdfs, load_guideline_artifact, page_texts
+from .guideline_index import GuidelineIndex
+from .settings import GUIDELINE_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build cached guideline text artifacts and index.")
+    parser.add_argument("--dir", default=GUIDELINE_DIR, help="Directory containing guideline PDFs.")
+    parser.add_argument("--force", action="store_true", help="Re-extract even if an artifact exists.")
+    args = parser.parse_args()
+
+    pdfs = guideline_pdfs(args.dir)
+    if not pdfs:
+        raise SystemExit(f"No PDFs found in {args.dir}")
+    for pdf_path in pdfs:
+        start = time.perf_counter()
+        artifact = load_guideline_artifact(pdf_path, force=args.force)
+        print(f"{artifact['source']}: {len(artifact['pages'])} pages, {len(artifact['text'])} chars, "
+              f"{len(artifact['headings'])} headings, sha256 {artifact['sha256'][:12]} "
+              f"({time.perf_counter() - start:.3f}s)")
+
+    start = time.perf_counter()
+    index = GuidelineIndex.load_or_build(pdfs, lambda p: page_texts(load_guideline_artifact(p)))
+    print(f"index: {len(index.chunks)} chunks, {len(index.vocab)} terms ({time.perf_counter() - start:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
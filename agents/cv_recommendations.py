@@ -0,0 +1,233 @@
+import json
+import re
+
+from .cv_sections import match_heading
+
+# Strict JSON schema for CV recommendations: every field required, nothing extra, so
+# the reply parses with one json.loads and needs no scraping.
+RECOMMENDATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "missing": {"type": "boolean"},
+                    "original": {"type": "string"},
+                    "recommended": {"type": "string"},
+                    "reasons": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["title", "missing", "original", "recommended", "reasons"],
+                "additionalProperties": False,
+            },
+        },
+        "suggested_structure": {"type": "array", "items": {"type": "string"}},
+        "rewritten_cv": {"type": "string"},
+    },
+    "required": ["sections", "suggested_structure", "rewritten_cv"],
+    "additionalProperties": False,
+}
+
+# Per-section fan-out: the section's title and original text are known locally, so the
+# model only returns what is new.
+SECTION_REVIEW_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "recommended": {"type": "string"},
+        "reasons": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["recommended", "reasons"],
+    "additionalProperties": False,
+}
+
+STRUCTURE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "suggested_structure": {"type": "array", "items": {"type": "string"}},
+        "missing_sections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "recommended": {"type": "string"},
+                    "reasons": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["title", "recommended", "reasons"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["suggested_structure", "missing_sections"],
+    "additionalProperties": False,
+}
+
+
+def json_format(name, schema):
+    """``response_format`` asking for strict JSON matching ``schema``."""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+RESPONSE_FORMAT = json_format("cv_recommendations", RECOMMENDATION_SCHEMA)
+SECTION_REVIEW_FORMAT = json_format("cv_section_review", SECTION_REVIEW_SCHEMA)
+STRUCTURE_FORMAT = json_format("cv_structure", STRUCTURE_SCHEMA)
+
+SECTIONS_ARRAY = re.compile(r'"sections"\s*:\s*\[')
+
+
+def _section(item):
+    if not isinstance(item, dict) or not isinstance(item.get("title"), str):
+        raise ValueError(f"Malformed recommendation section: {item!r}")
+    return {
+        "title": item["title"].strip(),
+        "missing": bool(item.get("missing")),
+        "original": str(item.get("original") or ""),
+        "recommended": str(item.get("recommended") or ""),
+        "reasons": [str(r) for r in item.get("reasons") or []],
+    }
+
+
+def parse_recommendations(text):
+    """Structured recommendations from the model's JSON reply; ValueError if it does not fit the schema."""
+    data = json.loads(text)
+    if not isinstance(data, dict) or not isinstance(data.get("sections"), list):
+        raise ValueError("Recommendation reply has no sections array.")
+    return {
+        "sections": [_section(item) for item in data["sections"]],
+        "suggested_structure": [str(s) for s in data.get("suggested_structure") or []],
+        "rewritten_cv": str(data.get("rewritten_cv") or ""),
+    }
+
+
+def parse_section_review(text, title, original):
+    """Full section entry from a per-section reply plus the locally known title and text."""
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Section review reply is not an object.")
+    return _section({**data, "title": title, "original": original, "missing": False})
+
+
+def parse_structure(text):
+    """Suggested order and recommended missing sections from the structure reply."""
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Structure reply is not an object.")
+    return {
+        "suggested_structure": [str(s) for s in data.get("suggested_structure") or []],
+        "missing_sections": [_section({**item, "original": "", "missing": True})
+                             for item in data.get("missing_sections") or [] if isinstance(item, dict)],
+    }
+
+
+def assemble_rewritten_cv(sections, order):
+    """Recommended (or unchanged original) section texts, in ``order`` where titles match it."""
+    def key(title):
+        return match_heading(title) or title.strip().lower()
+
+    rank = {}
+    for i, name in enumerate(order):
+        rank.setdefault(key(name), i)
+    # Header first, then by suggested order; unmatched sections keep their place at the end.
+    ordered = sorted(sections, key=lambda sec: -1 if sec["title"] == "Header" else rank.get(key(sec["title"]), len(rank)))
+    blocks = []
+    for sec in ordered:
+        content = (sec["recommended"] or sec["original"]).strip()
+        if not content:
+            continue
+        blocks.append(content if sec["title"] == "Header" else f"{sec['title']}\n{content}")
+    return "\n\n".join(blocks)
+
+
+def merge_sections(sections, structure):
+    """Reviewed sections plus the structure call's missing ones, with the rewritten CV assembled."""
+    present = {match_heading(sec["title"]) or sec["title"].lower() for sec in sections}
+    missing = [sec for sec in structure["missing_sections"]
+               if (match_heading(sec["title"]) or sec["title"].lower()) not in present]
+    sections = sections + missing
+    return {
+        "sections": sections,
+        "suggested_structure": structure["suggested_structure"],
+        "rewritten_cv": assemble_rewritten_cv(sections, structure["suggested_structure"]),
+    }
+
+
+def recommendations_to_markdown(result):
+    """Render structured recommendations in the markdown layout of the plain-text mode."""
+    blocks = []
+    for sec in result["sections"]:
+        lines = [f"## **{sec['title']}{' (Missing)' if sec['missing'] else ''}**",
+                 "**Original:**", sec["original"] or "Not present",
+                 "**Recommended:**", sec["recommended"] or "✅ No change needed"]
+        if sec["reasons"]:
+            lines += ["**Why this change:**"] + [f"- {r}" for r in sec["reasons"]]
+        blocks.append("\n".join(lines))
+    if result["suggested_structure"]:
+        blocks.append("## **Suggested CV Structure**\n" + "\n".join(
+            f"{i}. {name}" for i, name in enumerate(result["suggested_structure"], 1)))
+    if result["rewritten_cv"]:
+        blocks.append(f"## **Rewritten CV (placeholders preserved)**\n{result['rewritten_cv']}")
+    return "\n---\n".join(blocks) + "\n"
+
+
+class SectionStreamParser:
+    """Picks complete section objects out of a streamed JSON reply as they arrive.
+
+    feed() returns the sections whose closing brace has arrived; close() parses the whole
+    reply with parse_recommendations.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = None      # scan position inside the sections array, once found
+        self._depth = 0
+        self._start = None
+        self._in_string = False
+        self._escape = False
+        self._done = False
+        self.sections_seen = 0
+
+    @property
+    def text(self):
+        return self._buffer
+
+    def feed(self, delta):
+        self._buffer += delta
+        if self._done:
+            return []
+        if self._pos is None:
+            m = SECTIONS_ARRAY.search(self._buffer)
+            if not m:
+                return []
+            self._pos = m.end()
+        sections = []
+        buf = self._buffer
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    self._done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and ch == "}":
+                    sections.append(_section(json.loads(buf[self._start:i + 1])))
+        self._pos = len(buf)
+        self.sections_seen += len(sections)
+        return sections
+
+    def close(self):
+        return parse_recommendations(self._buffer)
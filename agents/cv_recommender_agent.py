@@ -1,23 +1,169 @@
-from .agent_base import AgentBase
+from . import settings
+from .agent_base import AgentBase, in_context
+from .cv_recommendations import (RESPONSE_FORMAT, SECTION_REVIEW_FORMAT, STRUCTURE_FORMAT, merge_sections,
+                                 parse_recommendations, parse_section_review, parse_structure)
+from .cv_sections import SECTION_ALIASES, detect_section_headings, segment_cv
+from .guideline_index import GuidelineIndex
+from .guideline_store import load_guideline_artifact, page_texts
+from .prompt_builder import PromptTemplate, tagged
+from .settings import MODEL
+from .text_chunking import estimate_tokens
+from .text_store import fingerprint
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
 import re
-import pdfplumber
-from textwrap import shorten
 
 ANON_TAG_PATTERN = re.compile(r"<([A-Z_]+)>")
 
+# Static prompt parts: identical bytes on every call, so they form the cacheable prefix.
+CV_REVIEWER_ROLE = (
+    "You are an expert CV reviewer and formatter. The CV text provided is ANONYMIZED: placeholders like "
+    "<PERSON>, <EMAIL_ADDRESS>, <PHONE_NUMBER>, <DISTRICT>, <COMMUNE>, <LOCATION> signify that real data "
+    "is present but masked. Never suggest adding information already indicated by a placeholder. Focus on: "
+    "structure, missing sections, measurable impact, clarity, ordering, concision, consistency, and alignment "
+    "with professional standards and the supplied guideline. Be actionable and concise."
+)
+
+STYLE_RULES = (
+    "STYLE RULES:\n"
+    "- Never ask to add data already represented by placeholders (<PERSON>, <EMAIL_ADDRESS>, <PHONE_NUMBER>, <DISTRICT>, <COMMUNE>, <LOCATION>).\n"
+    "- Respect placeholders exactly; do not expand, reveal, or invent personal data.\n"
+    "- Be specific: quantify impact; use strong action verbs; tighten wording; keep formatting consistent.\n"
+    "- Preserve factual meaning; do not fabricate achievements or employers.\n"
+    "- Bullets (if used) start with a verb and (where possible) include metrics/scope.\n"
+    "- Avoid repeating the same soft skills across multiple bullets unless context differs.\n"
+)
+
+FORMAT_INSTRUCTIONS = (
+    "OUTPUT FORMAT REQUIREMENTS (strict):\n"
+    "For each logical CV section (e.g., Header, Objective/Summary, Education, Experience, Projects, Skills, "
+    "Achievements/Awards, Activities/Leadership, Certifications, Languages, Additional/Other), produce a block in this exact shape:\n\n"
+    "## **<Section Name>**  (Click to load recommendations)\n"
+    "**Original:**\n"
+    "[original text OR 'Not present']\n"
+    "**Recommended:**\n"
+    ">>> paste-ready improved content (concise; keep placeholders intact). If no change, write: '✅ No change needed'. <<<\n"
+    "**Why this change:**\n"
+    "- Reason 1 (e.g., clarity, quantification, structure, consistency)\n"
+    "- Reason 2 (e.g., stronger verbs, metrics, ordering)\n"
+    "---\n\n"
+    "If a section is missing, add ' (Missing)' immediately after the section name and provide a recommended version.\n"
+    "If removing weak content, include: (Remove: brief reason) inside the Recommended block.\n\n"
+    + STYLE_RULES +
+    "- No code fences, no JSON wrappers.\n\n"
+    "FINAL SECTIONS (mandatory):\n"
+    "## **Suggested CV Structure**  (Click to load recommendations)\n"
+    "**Original:**\n"
+    "[Detected ordering summary]\n"
+    "**Recommended:**\n"
+    ">>> List ideal ordered section names (and any optional items) <<<\n"
+    "---\n\n"
+    "## **Rewritten CV (placeholders preserved)**\n"
+    "[BEGIN_REWRITTEN_CV]\n"
+    "- Produce a single cohesive CV that integrates all your 'Recommended' content above in the 'Suggested CV Structure' order.\n"
+    "- Keep all placeholders exactly as they appear (e.g., <PERSON>, <EMAIL_ADDRESS>). Do not replace or reveal them.\n"
+    "- Maintain clean, professional formatting (headings and bullets) suitable for direct copy-paste.\n"
+    "- Do NOT include 'Why this change' notes here.\n"
+    "[END_REWRITTEN_CV]\n"
+)
+
+# Structured mode: the JSON schema carries the layout, so no headings, markers or emoji.
+STRUCTURED_INSTRUCTIONS = (
+    "OUTPUT: a JSON object matching the response schema.\n"
+    "- sections: one entry per logical CV section (e.g., Header, Objective/Summary, Education, Experience, "
+    "Projects, Skills, Achievements/Awards, Activities/Leadership, Certifications, Languages, Additional/Other), "
+    "in the CV's order, then any missing ones with missing=true and original=\"\".\n"
+    "- original: the section text as it appears in the CV. recommended: paste-ready improved content, "
+    "or \"\" if no change is needed; if removing weak content, say so with a brief reason. "
+    "reasons: short reasons for the change (clarity, quantification, structure, ordering...).\n"
+    "- suggested_structure: the ideal ordered list of section names.\n"
+    "- rewritten_cv: one cohesive CV integrating all recommended content in suggested_structure order, "
+    "plain headings and bullets, no reasons.\n\n"
+    + STYLE_RULES
+)
+
+# Per-section fan-out: one short call per detected section, plus one for the overall structure.
+SECTION_INSTRUCTIONS = (
+    "TASK: review ONE section of the CV, given in <SECTION> together with its heading.\n"
+    "OUTPUT: a JSON object matching the response schema.\n"
+    "- recommended: paste-ready improved content for this section only, without its heading, "
+    "or \"\" if no change is needed; if removing weak content, say so with a brief reason.\n"
+    "- reasons: short reasons for the change (clarity, quantification, structure, ordering...).\n\n"
+    + STYLE_RULES
+)
+
+STRUCTURE_INSTRUCTIONS = (
+    "TASK: judge the CV's overall structure from its section outline.\n"
+    "OUTPUT: a JSON object matching the response schema.\n"
+    "- suggested_structure: the ideal ordered list of section names; keep the outline's names for "
+    "sections already present.\n"
+    "- missing_sections: sections a strong CV for this profile should add, each with a concise paste-ready "
+    "recommended version and short reasons. Never list a section that is in the outline.\n\n"
+    + STYLE_RULES
+)
+
+# Guidance that applies to every CV; its excerpts are fixed and live in the static prefix.
+GENERAL_GUIDELINE_QUERY = "CV structure order recent first"
+
+
+def _format_chunks(chunks):
+    return "\n\n".join(f"[{c['source']} p.{c['page']}]\n{c['text']}" for c in chunks)
+
+
 class CVRecommenderAgent(AgentBase):
-    def __init__(self, guideline_pdf_path, max_retries=2, verbose=True, guideline_max_chars=12000):
+    def __init__(self, guideline_pdf_path, max_retries=2, verbose=True,
+                 guideline_top_k=8, guideline_token_budget=1500):
         super().__init__(name="CVRecommenderAgent", max_retries=max_retries, verbose=verbose)
-        full_guideline = self._extract_guideline_text(guideline_pdf_path)
-        self.guideline_text = shorten(full_guideline, width=guideline_max_chars, placeholder="\n...[truncated]...")
+        pdf_paths = [guideline_pdf_path] if isinstance(guideline_pdf_path, str) else list(guideline_pdf_path)
+        self.guideline_top_k = guideline_top_k
+        self.guideline_token_budget = guideline_token_budget
+        self.guideline_index = GuidelineIndex.load_or_build(pdf_paths, self._extract_guideline_pages)
+        # Half of the excerpt budget goes to general excerpts in the static prefix, which also
+        # keeps that prefix above the 1024 tokens providers need before they cache it.
+        self.general_guideline_ids = self.guideline_index.select_ids(
+            [GENERAL_GUIDELINE_QUERY], top_k=max(1, guideline_top_k // 2), token_budget=guideline_token_budget // 2)
+        self.section_guideline_top_k = guideline_top_k - len(self.general_guideline_ids)
+        self.section_guideline_budget = guideline_token_budget - guideline_token_budget // 2
+        general = _format_chunks([self.guideline_index.chunks[i] for i in self.general_guideline_ids])
+        general = f"General guideline reference (for identifying gaps / best practices):\n{general}" if general else ""
+        user_note = ("The user message holds section-specific guideline excerpts, the detected placeholders "
+                     "and the anonymized CV to review.")
+        # Both templates open with the same role and guideline text, so they share a cached prefix.
+        self.prompt = PromptTemplate("cv.recommend", CV_REVIEWER_ROLE, general, FORMAT_INSTRUCTIONS, user_note)
+        self.structured_prompt = PromptTemplate("cv.recommend.json", CV_REVIEWER_ROLE, general,
+                                                STRUCTURED_INSTRUCTIONS, user_note)
+        self.section_prompt = PromptTemplate(
+            "cv.recommend.section", CV_REVIEWER_ROLE, SECTION_INSTRUCTIONS,
+            "The user message holds guideline excerpts for this section, the detected placeholders "
+            "and the section to review.")
+        self.structure_prompt = PromptTemplate(
+            "cv.recommend.structure", CV_REVIEWER_ROLE, general, STRUCTURE_INSTRUCTIONS,
+            "The user message holds the CV's section outline and the detected placeholders.")
+        self._cache_version = None
+
+    @property
+    def cache_version(self):
+        """Model, prompt template and guideline index that shape ``execute``'s output."""
+        if self._cache_version is None:
+            self._cache_version = fingerprint(
+                type(self).__name__, MODEL, self._build_messages(""), self._build_messages("", structured=True),
+                RESPONSE_FORMAT, self.section_prompt.static_prefix, SECTION_REVIEW_FORMAT,
+                self.structure_prompt.static_prefix, STRUCTURE_FORMAT, self.guideline_index.key,
+                self.guideline_top_k, self.guideline_token_budget,
+            )
+        return self._cache_version
+
+    def _extract_guideline_pages(self, pdf_path):
+        return page_texts(load_guideline_artifact(pdf_path))
 
-    def _extract_guideline_text(self, pdf_path):
-        text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                pg_txt = page.extract_text() or ""
-                text += pg_txt + "\n"
-        return text
+    def guideline_context(self, cv_text):
+        """Guideline excerpts for the sections detected in the CV, beyond the general ones in the prefix."""
+        sections = detect_section_headings(cv_text) or ["Education", "Experience", "Skills"]
+        queries = [" ".join(SECTION_ALIASES[name]) for name in sections]
+        chunks = self.guideline_index.select(queries, top_k=self.section_guideline_top_k,
+                                             token_budget=self.section_guideline_budget,
+                                             exclude=set(self.general_guideline_ids))
+        return _format_chunks(chunks)
 
     def _collect_anonymized_presence(self, cv_text):
         counts = {}
@@ -25,72 +171,118 @@ class CVRecommenderAgent(AgentBase):
             tag = m.group(1)
             counts[tag] = counts.get(tag, 0) + 1
         return counts
-    def execute(self, cv_text):
+    def _placeholder_summary(self, cv_text):
         anon_counts = self._collect_anonymized_presence(cv_text)
         anon_summary = ", ".join(f"{k}:{v}" for k,v in anon_counts.items()) if anon_counts else "none"
+        return f"Anonymization placeholders detected (token:count): {anon_summary}"
 
-        format_instructions = (
-            "OUTPUT FORMAT REQUIREMENTS (strict):\n"
-            "For each logical CV section (e.g., Header, Objective/Summary, Education, Experience, Projects, Skills, "
-            "Achievements/Awards, Activities/Leadership, Certifications, Languages, Additional/Other), produce a block in this exact shape:\n\n"
-            "## **<Section Name>**  (Click to load recommendations)\n"
-            "**Original:**\n"
-            "[original text OR 'Not present']\n"
-            "**Recommended:**\n"
-            ">>> paste-ready improved content (concise; keep placeholders intact). If no change, write: '✅ No change needed'. <<<\n"
-            "**Why this change:**\n"
-            "- Reason 1 (e.g., clarity, quantification, structure, consistency)\n"
-            "- Reason 2 (e.g., stronger verbs, metrics, ordering)\n"
-            "---\n\n"
-            "If a section is missing, add ' (Missing)' immediately after the section name and provide a recommended version.\n"
-            "If removing weak content, include: (Remove: brief reason) inside the Recommended block.\n\n"
-            "STYLE RULES:\n"
-            "- Never ask to add data already represented by placeholders (<PERSON>, <EMAIL_ADDRESS>, <PHONE_NUMBER>, <DISTRICT>, <COMMUNE>, <LOCATION>).\n"
-            "- Respect placeholders exactly; do not expand, reveal, or invent personal data.\n"
-            "- Be specific: quantify impact; use strong action verbs; tighten wording; keep formatting consistent.\n"
-            "- Preserve factual meaning; do not fabricate achievements or employers.\n"
-            "- Bullets (if used) start with a verb and (where possible) include metrics/scope.\n"
-            "- Avoid repeating the same soft skills across multiple bullets unless context differs.\n"
-            "- No code fences, no JSON wrappers.\n\n"
-            "FINAL SECTIONS (mandatory):\n"
-            "## **Suggested CV Structure**  (Click to load recommendations)\n"
-            "**Original:**\n"
-            "[Detected ordering summary]\n"
-            "**Recommended:**\n"
-            ">>> List ideal ordered section names (and any optional items) <<<\n"
-            "---\n\n"
-            "## **Rewritten CV (placeholders preserved)**\n"
-            "[BEGIN_REWRITTEN_CV]\n"
-            "- Produce a single cohesive CV that integrates all your 'Recommended' content above in the 'Suggested CV Structure' order.\n"
-            "- Keep all placeholders exactly as they appear (e.g., <PERSON>, <EMAIL_ADDRESS>). Do not replace or reveal them.\n"
-            "- Maintain clean, professional formatting (headings and bullets) suitable for direct copy-paste.\n"
-            "- Do NOT include 'Why this change' notes here.\n"
-            "[END_REWRITTEN_CV]\n"
+    def _build_messages(self, cv_text, structured=False):
+        prompt = self.structured_prompt if structured else self.prompt
+        return prompt.messages(
+            f"Section-specific guideline reference:\n{self.guideline_context(cv_text)}",
+            self._placeholder_summary(cv_text),
+            f"Anonymized CV Text:\n{cv_text}",
         )
 
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are an expert CV reviewer and formatter. The CV text provided is ANONYMIZED: placeholders like "
-                    "<PERSON>, <EMAIL_ADDRESS>, <PHONE_NUMBER>, <DISTRICT>, <COMMUNE>, <LOCATION> signify that real data "
-                    "is present but masked. Never suggest adding information already indicated by a placeholder. Focus on: "
-                    "structure, missing sections, measurable impact, clarity, ordering, concision, consistency, and alignment "
-                    "with professional standards and the supplied guideline. Be actionable and concise."
-                )
-            },
-            {
-                "role": "user",
-                "content": (
-                    "Guideline Reference (for identifying gaps / best practices):\n"
-                    f"{self.guideline_text}\n\n"
-                    f"Anonymization placeholders detected (token:count): {anon_summary}\n\n"
-                    "Anonymized CV Text:\n"
-                    f"{cv_text}\n\n"
-                    f"{format_instructions}"
-                )
-            }
-        ]
-        recommendations = self.call_openai(messages, max_tokens=2200)
+    def execute(self, cv_text, stream=False, structured=False):
+        """With stream=True, returns a generator of text deltas instead of the full reply.
+        With structured=True the reply is JSON matching RECOMMENDATION_SCHEMA.
+        """
+        recommendations = self.call_openai(self._build_messages(cv_text, structured), max_tokens=2200, stream=stream,
+                                           response_format=RESPONSE_FORMAT if structured else None)
         return recommendations
 
+    async def aexecute(self, cv_text, structured=False):
+        return await self.acall_openai(self._build_messages(cv_text, structured), max_tokens=2200,
+                                       response_format=RESPONSE_FORMAT if structured else None)
+
+    def recommend(self, cv_text):
+        """Structured recommendations: {"sections", "suggested_structure", "rewritten_cv"}."""
+        return parse_recommendations(self.execute(cv_text, structured=True).content)
+
+    async def arecommend(self, cv_text):
+        return parse_recommendations((await self.aexecute(cv_text, structured=True)).content)
+
+    def _section_messages(self, segment):
+        # The text above the first heading is mostly name and contact details.
+        aliases = SECTION_ALIASES.get(segment["section"], SECTION_ALIASES["Contact"])
+        chunks = self.guideline_index.select([" ".join(aliases)], top_k=max(1, self.section_guideline_top_k // 2),
+                                             token_budget=self.section_guideline_budget // 2)
+        return self.section_prompt.messages(
+            f"Guideline reference for this section:\n{_format_chunks(chunks)}" if chunks else "",
+            self._placeholder_summary(segment["text"]),
+            tagged("SECTION", segment["text"].strip()),
+        )
+
+    def _structure_messages(self, segments):
+        outline = "\n".join(f"- {_section_title(seg)}: {_preview(seg['body'])}" for seg in segments)
+        return self.structure_prompt.messages(
+            f"Section outline (heading: opening text):\n{outline}",
+            self._placeholder_summary("".join(seg["text"] for seg in segments)),
+        )
+
+    def _section_budget(self, segment):
+        # Room for a rewrite somewhat longer than the original, plus reasons.
+        return min(900, max(200, int(estimate_tokens(segment["text"]) * 1.5) + 120))
+
+    def recommend_section(self, segment):
+        reply = self.call_openai(self._section_messages(segment), max_tokens=self._section_budget(segment),
+                                 response_format=SECTION_REVIEW_FORMAT)
+        return parse_section_review(reply.content, _section_title(segment), segment["body"])
+
+    def recommend_structure(self, segments):
+        reply = self.call_openai(self._structure_messages(segments), max_tokens=600,
+                                 response_format=STRUCTURE_FORMAT)
+        return parse_structure(reply.content)
+
+    def recommend_by_section(self, cv_text, segments=None, on_section=None):
+        """Structured recommendations from concurrent per-section calls.
+
+        Each detected section is reviewed in its own short request with only its guideline
+        excerpts; a structure call, run alongside them, returns the suggested order and the
+        missing sections. ``on_section(index, section)`` is called in this thread as each
+        section completes. CVs without detected headings get a single ``recommend`` call.
+        """
+        segments = segment_cv(cv_text) if segments is None else segments
+        if len(segments) < 2:
+            result = self.recommend(cv_text)
+            for i, sec in enumerate(result["sections"]):
+                if on_section:
+                    on_section(i, sec)
+            return result
+        sections = [None] * len(segments)
+        with ThreadPoolExecutor(max_workers=min(settings.LLM_CONCURRENCY, len(segments) + 1)) as pool:
+            structure = pool.submit(in_context(self.recommend_structure), segments)
+            futures = {pool.submit(in_context(self.recommend_section), seg): i for i, seg in enumerate(segments)}
+            for future in as_completed(futures):
+                i = futures[future]
+                sections[i] = future.result()
+                if on_section:
+                    on_section(i, sections[i])
+            structure = structure.result()
+        return merge_sections(sections, structure)
+
+    async def arecommend_by_section(self, cv_text, segments=None):
+        segments = segment_cv(cv_text) if segments is None else segments
+        if len(segments) < 2:
+            return await self.arecommend(cv_text)
+
+        async def review(segment):
+            reply = await self.acall_openai(self._section_messages(segment), max_tokens=self._section_budget(segment),
+                                            response_format=SECTION_REVIEW_FORMAT)
+            return parse_section_review(reply.content, _section_title(segment), segment["body"])
+
+        structure_reply, *sections = await asyncio.gather(
+            self.acall_openai(self._structure_messages(segments), max_tokens=600, response_format=STRUCTURE_FORMAT),
+            *(review(seg) for seg in segments),
+        )
+        return merge_sections(sections, parse_structure(structure_reply.content))
+
+
+def _section_title(segment):
+    return segment["heading"].rstrip(" :\t") or "Header"
+
+
+def _preview(body, limit=100):
+    line = " ".join(body.split())
+    return line if len(line) <= limit else line[:limit].rsplit(" ", 1)[0] + "…"
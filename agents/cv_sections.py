@@ -0,0 +1,78 @@
+import re
+
+# Canonical CV section -> heading variants seen in CVs (matched case-insensitively).
+SECTION_ALIASES = {
+    "Contact": ["contact", "contacts", "contact information", "contact details", "personal information",
+                "personal details", "personal data"],
+    "Objective": ["objective", "career objective", "summary", "profile", "professional summary", "about me"],
+    "Education": ["education", "academic background", "academic history", "qualifications", "studies",
+                  "academic records", "academic record", "academic achievements"],
+    "Experience": ["experience", "work experience", "professional experience", "employment", "internships",
+                   "internship", "work history"],
+    "Projects": ["projects", "academic projects", "research projects", "research"],
+    "Skills": ["skills", "technical skills", "computer skills", "computer literacy", "competencies",
+               "skills summary", "soft skills", "key skills"],
+    "Languages": ["languages", "language", "language skills"],
+    "Achievements": ["achievements", "awards", "honors", "honours", "awards and honors", "scholarships"],
+    "Activities": ["activities", "extracurricular activities", "leadership", "volunteering",
+                   "volunteer experience", "volunteer", "voluntary works", "social and voluntary works",
+                   "interests", "hobbies", "hobbies and sports", "hobbies and sport", "hobbies and interests"],
+    "Certifications": ["certifications", "certificates", "trainings", "training", "courses"],
+    "Publications": ["publications", "papers"],
+    "References": ["references", "reference", "referees"],
+}
+
+_ALIAS_TO_SECTION = {alias: section for section, aliases in SECTION_ALIASES.items() for alias in aliases}
+_HEADING_CLEAN = re.compile(r"[^\w\s&/]+")
+
+
+def match_heading(line):
+    """Canonical section name if ``line`` looks like a CV section heading, else None."""
+    stripped = line.strip()
+    if not stripped or len(stripped) > 60 or len(stripped.split()) > 5:
+        return None
+    key = " ".join(_HEADING_CLEAN.sub(" ", stripped).lower().replace("&", " and ").split())
+    return _ALIAS_TO_SECTION.get(key)
+
+
+def detect_section_headings(text):
+    """Canonical names of the sections whose headings appear in ``text``, in order of appearance."""
+    seen = []
+    for line in text.splitlines():
+        section = match_heading(line)
+        if section and section not in seen:
+            seen.append(section)
+    return seen
+
+
+def segment_cv(text):
+    """Split a CV into sections at detected headings.
+
+    Returns ``[{"section", "heading", "body", "text"}]`` in document order. Text before the
+    first heading is a "Header" segment with an empty heading. ``text`` is the exact slice
+    (heading line included), so joining the segments' ``text`` gives back any non-blank input.
+    """
+    segments = []
+    current = {"section": "Header", "heading": "", "lines": []}
+    for line in text.splitlines(keepends=True):
+        section = match_heading(line)
+        if section:
+            segments.append(current)
+            current = {"section": section, "heading": line.strip(), "lines": [line]}
+        else:
+            current["lines"].append(line)
+    segments.append(current)
+
+    out, carry = [], ""
+    for seg in segments:
+        raw = carry + "".join(seg.pop("lines"))
+        if not seg["heading"] and not raw.strip():
+            # Blank lines before the first heading: keep them with the next segment.
+            carry = raw
+            continue
+        carry = ""
+        body = raw.strip()
+        if seg["heading"]:
+            body = body.split("\n", 1)[1].strip() if "\n" in body else ""
+        out.append({**seg, "body": body, "text": raw})
+    return out
@@ -0,0 +1,37 @@
+import os
+from .agent_base import AgentBase
+from .docx_text_agent import DOCXTextAgent
+from .pdf_backends import read_source
+from .pdf_text_agent import PDFTextAgent
+
+SUPPORTED_TYPES = ("pdf", "docx")
+
+
+def detect_type(source, filename=None):
+    """'pdf' or 'docx', from the file name when given, otherwise from the leading bytes."""
+    name = filename or (os.fspath(source) if isinstance(source, (str, os.PathLike)) else "")
+    ext = os.path.splitext(name)[1].lower().lstrip(".")
+    if ext in SUPPORTED_TYPES:
+        return ext
+    data = read_source(source)
+    if isinstance(data, str):
+        with open(data, "rb") as f:
+            data = f.read(8)
+    if data.startswith(b"%PDF"):
+        return "pdf"
+    if data.startswith(b"PK\x03\x04"):
+        return "docx"
+    raise ValueError(f"Unsupported document type for '{name or 'upload'}'. Expected PDF or DOCX.")
+
+
+class DocumentTextAgent(AgentBase):
+    """Text extraction for uploaded documents, dispatching to the PDF or DOCX extractor."""
+
+    def __init__(self, pdf_backend=None):
+        super().__init__(name="DocumentTextAgent")
+        self.extractors = {"pdf": PDFTextAgent(backend=pdf_backend), "docx": DOCXTextAgent()}
+
+    def extract_text(self, source, filename=None):
+        data = read_source(source)
+        doc_type = detect_type(data, filename)
+        return self.extractors[doc_type].extract_text(data)
@@ -0,0 +1,78 @@
+import io
+from docx import Document
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+from .agent_base import AgentBase
+from .pdf_backends import read_source
+
+_PARAGRAPH = qn("w:p")
+_TABLE = qn("w:tbl")
+_CONTENT_CONTROL = qn("w:sdt")
+_CONTENT_CONTROL_BODY = qn("w:sdtContent")
+_TEXTBOX = qn("w:txbxContent")
+_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+
+def _open(source):
+    source = read_source(source)
+    return Document(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _textbox_lines(element, parent):
+    # Floating text boxes (often used for section headings) are not part of
+    # paragraph.text. Word stores each one twice: the DrawingML version and a
+    # VML copy under mc:Fallback, so the fallback copy is skipped.
+    for box in element.iter(_TEXTBOX):
+        if any(a.tag == _FALLBACK for a in box.iterancestors()):
+            continue
+        for p in box.iter(_PARAGRAPH):
+            text = Paragraph(p, parent).text.strip()
+            if text:
+                yield text
+
+
+def _row_text(row):
+    # Merged cells are returned once per grid column; keep each cell once.
+    seen, cells = set(), []
+    for cell in row.cells:
+        if id(cell._tc) in seen:
+            continue
+        seen.add(id(cell._tc))
+        cells.append(" ".join(p.text.strip() for p in cell.paragraphs if p.text.strip()))
+    return " | ".join(c for c in cells if c)
+
+
+def _blocks(container, document):
+    for child in container.iterchildren():
+        if child.tag == _PARAGRAPH:
+            yield from _textbox_lines(child, document)
+            yield Paragraph(child, document).text
+        elif child.tag == _TABLE:
+            for row in Table(child, document).rows:
+                text = _row_text(row)
+                if text:
+                    yield text
+        elif child.tag == _CONTENT_CONTROL:
+            # Content controls (template fields, often whole CV sections) wrap their blocks in w:sdtContent.
+            for content in child.iterchildren(_CONTENT_CONTROL_BODY):
+                yield from _blocks(content, document)
+
+
+def iter_blocks(source):
+    """Yield paragraph and table-row text in body order, one block at a time."""
+    document = _open(source)
+    yield from _blocks(document.element.body, document)
+
+
+class DOCXTextAgent(AgentBase):
+    def __init__(self):
+        super().__init__(name="DOCXTextAgent")
+
+    def iter_blocks(self, source):
+        """Text blocks from a path, bytes, or binary file-like object."""
+        return iter_blocks(source)
+
+    def extract_text(self, source):
+        return "".join(block + "\n" for block in self.iter_blocks(source))
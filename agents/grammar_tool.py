@@ -1,6 +1,16 @@
-from .agent_base import AgentBase
+from .agent_base import AgentBase, in_context
+from .prompt_builder import PromptTemplate, tagged
+from . import settings
+from .settings import MODEL
+from .text_chunking import estimate_tokens, split_for_correction, stitch
+from .text_store import fingerprint, gazetteer_version
+from concurrent.futures import ThreadPoolExecutor
+from openai.types.chat import ChatCompletionMessage
+import asyncio
 import os
+import re
 from rapidfuzz import process, fuzz
+from loguru import logger
 
 DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
 
@@ -12,101 +22,249 @@ def _load_list(filename):
     except FileNotFoundError:
         return []
 
+
+WORD_PATTERN = re.compile(r"[^\W_]+(?:['’][^\W_]+)*")
+
+
+def _normalize_place(name):
+    return " ".join(name.split()).lower()
+
+
+class PlaceNameCanonicalizer:
+    """Deterministic, local correction of district/commune spellings with rapidfuzz.
+
+    Choice lists are normalized once and bucketed by word count. Every run of up to
+    N words in the text (N = longest name) is compared with the names that have the
+    same number of words, and the longest run scoring at least ``score_cutoff`` wins.
+    Every word of a fuzzy candidate must be capitalized (lowercase runs are only taken
+    on an exact match), and ties between two different names are left untouched, so
+    lowercase prose and ambiguous spans are not rewritten.
+    """
+
+    def __init__(self, district_names, commune_names, score_cutoff=88, single_word_cutoff=92):
+        self.score_cutoff = score_cutoff
+        self.single_word_cutoff = single_word_cutoff
+        self._canonical = {}
+        for entity_type, names in (("District", district_names), ("Commune", commune_names)):
+            for name in names:
+                self._canonical.setdefault(_normalize_place(name), (name.strip(), entity_type))
+        self._buckets = {}
+        for key in self._canonical:
+            self._buckets.setdefault(len(key.split()), []).append(key)
+        self.max_words = max(self._buckets, default=0)
+
+    def _match(self, candidate, n_words):
+        choices = self._buckets.get(n_words)
+        if not choices:
+            return None
+        cutoff = self.single_word_cutoff if n_words == 1 else self.score_cutoff
+        matches = process.extract(candidate, choices, scorer=fuzz.ratio, score_cutoff=cutoff, limit=2)
+        if not matches:
+            return None
+        best_key, best_score, _ = matches[0]
+        if len(matches) > 1 and matches[1][1] == best_score:
+            return None
+        if n_words == 1 and best_score < 100 and (best_key.startswith(candidate) or candidate.startswith(best_key)):
+            # Truncations and suffixes ("Olympics") are ordinary words more often than typos.
+            return None
+        return best_key, best_score
+
+    def canonicalize(self, text):
+        """Return ``(corrected_text, changes)``; each change records the span, canonical name and score."""
+        words = list(WORD_PATTERN.finditer(text))
+        changes = []
+        i = 0
+        while i < len(words):
+            consumed = 1
+            for n in range(min(self.max_words, len(words) - i), 0, -1):
+                first, last = words[i], words[i + n - 1]
+                start, end = first.start(), last.end()
+                span = text[start:end]
+                if any(not text[words[j].end():words[j + 1].start()].isspace() for j in range(i, i + n - 1)):
+                    continue
+                # Place names are capitalized: lowercase runs ("mean they") are ordinary words
+                # unless they spell a multi-word name exactly.
+                capitalized = all(words[j].group(0)[0].isupper() for j in range(i, i + n))
+                if n == 1 and not capitalized:
+                    continue
+                if len(span) < 4:
+                    continue
+                match = self._match(_normalize_place(span), n)
+                if match is None or (not capitalized and match[1] < 100):
+                    continue
+                key, score = match
+                canonical, entity_type = self._canonical[key]
+                if span != canonical:
+                    changes.append({
+                        "entity_type": entity_type,
+                        "original": span,
+                        "canonical": canonical,
+                        "score": round(score, 1),
+                        "start": start,
+                        "end": end,
+                    })
+                consumed = n
+                break
+            i += consumed
+
+        parts = []
+        cursor = 0
+        for change in changes:
+            parts.append(text[cursor:change["start"]])
+            parts.append(change["canonical"])
+            cursor = change["end"]
+        parts.append(text[cursor:])
+        return "".join(parts), changes
+
+
+def format_place_changes(changes):
+    """Markdown table of local place-name corrections."""
+    lines = [
+        "| Entity Type | Original Span | Corrected Canonical Name | Match Score |",
+        "|---|---|---|---|",
+    ]
+    if not changes:
+        lines.append("| (None) | (None) | (None) | (None) |")
+    for c in changes:
+        lines.append(f"| {c['entity_type']} | {c['original']} | {c['canonical']} | {c['score']:.1f} |")
+    return "\n".join(lines)
+
+
+NORMALIZE_PROMPT = PromptTemplate(
+    "grammar.normalize",
+    "You are a careful copy editor. Fix grammar, spelling, and punctuation. "
+    "Cambodian district and commune names in the text are already in their canonical spelling: "
+    "keep them exactly as written and do not introduce new place names. "
+    "Return ONLY the final corrected text—no explanations.",
+    "RULES:\n"
+    "1) Keep every Cambodian place name exactly as written.\n"
+    "2) Correct grammar, spelling, and punctuation.\n"
+    "3) Output ONLY the corrected text. No headers, no code fences, no commentary.\n"
+    "4) The user message is the text to correct, between <TEXT> and </TEXT>.\n"
+    "5) Text between <CONTEXT> and </CONTEXT>, if any, is the preceding part of the document, "
+    "given for reference only: do not correct or repeat it.",
+)
+
+REPORT_PROMPT = PromptTemplate(
+    "grammar.report",
+    "You are an expert editor. Fix grammar and style. Cambodian district and commune names are "
+    "already canonical: keep them exactly as written. "
+    "Report changes precisely, explain why you made them, and return the final corrected text.",
+    "TASKS (do all) for the text between <TEXT> and </TEXT> in the user message:\n"
+    "A) For grammar/style improvements, output a markdown table with EXACTLY these columns:\n"
+    "   | Original Phrase | Improved Phrase | Reason for Change |\n"
+    "   - Only include rows where you changed something.\n"
+    "   - If none, include one row: (None) | No changes needed | (None).\n"
+    "   - The Reason for Change column must briefly explain why the improvement was made "
+    "(e.g., spelling correction, grammar fix, clarity, professional tone).\n\n"
+    "B) After the table, print a heading 'Full corrected text:' followed by ONLY the final corrected text.\n"
+    "   Do not wrap in code fences.\n\n"
+    "CONSTRAINTS:\n"
+    "• Keep every Cambodian place name exactly as written.\n"
+    "• Keep meaning intact.",
+)
+
+
 class Grammar_Checking(AgentBase):
+    persist_responses = False
+
     def __init__(self, max_retries, verbose=True,
                  district_file = "district.txt",
-                 commune_file = "commune.txt"):
+                 commune_file = "commune.txt",
+                 chunk_tokens=400, chunk_overlap_tokens=60):
         
         super().__init__(name="GrammarCheckingTool", max_retries=max_retries, verbose=verbose)
         self.district_names = _load_list(district_file)
         self.commune_names = _load_list(commune_file)
-        self.district_list = "; ".join(self.district_names) if self.district_names else "(none loaded)"
-        self.commune_list  = "; ".join(self.commune_names) if self.commune_names else "(none loaded)"
-    def execute(self, text):
-        districts = self.district_list
-        communes  = self.commune_list
-
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a careful copy editor. Your priority is to CORRECT any misspelled "
-                    "district or commune names to their exact canonical form from the allowed lists. "
-                    "You MUST NOT introduce any name that is not in the lists. "
-                    "If a phrase looks like a district/commune but you cannot confidently match it to a canonical name, "
-                    "leave the user text as-is (do NOT guess). "
-                    "After name canonicalization, also fix general grammar and spelling. "
-                    "Return ONLY the final corrected text—no explanations."
-                )
-            },
-            {
-                "role": "user",
-                "content": (
-                    "ALLOWED CANONICAL NAMES (use exact spelling and capitalization):\n"
-                    f"- Districts: {districts}\n"
-                    f"- Communes: {communes}\n\n"
-                    "RULES:\n"
-                    "1) Match names case-insensitively and tolerate minor typos/spacing.\n"
-                    "2) Replace matched names with the EXACT canonical spelling from the lists.\n"
-                    "3) Do NOT invent new names. If uncertain, keep the original span unchanged.\n"
-                    "4) After names are fixed, correct grammar, spelling, and punctuation.\n"
-                    "5) Output ONLY the corrected text. No headers, no code fences, no commentary.\n\n"
-                    "TEXT:\n"
-                    "<TEXT>\n"
-                    f"{text}\n"
-                    "</TEXT>"
-                )
-            }
-        ]
-        corrected = self.call_openai(messages, max_tokens=800)
-        return corrected
+        self.canonicalizer = PlaceNameCanonicalizer(self.district_names, self.commune_names)
+        # Texts longer than chunk_tokens are corrected in concurrent chunks of about that size.
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self._cache_version = None
+
+    @property
+    def cache_version(self):
+        """Everything that shapes ``execute``'s output: model, prompt, gazetteers and match cutoffs."""
+        if self._cache_version is None:
+            self._cache_version = fingerprint(
+                type(self).__name__, MODEL, self._normalize_messages(""),
+                gazetteer_version(self.district_names, self.commune_names),
+                self.canonicalizer.score_cutoff, self.canonicalizer.single_word_cutoff,
+                self.chunk_tokens, self.chunk_overlap_tokens,
+            )
+        return self._cache_version
+
+    def canonicalize_places(self, text):
+        """Fix district/commune spellings locally; returns ``(corrected_text, changes)``."""
+        corrected, changes = self.canonicalizer.canonicalize(text)
+        if self.verbose and changes:
+            for c in changes:
+                logger.info(f"[{self.name}] {c['entity_type']}: '{c['original']}' -> '{c['canonical']}' (score {c['score']})")
+        return corrected, changes
+
+    def _normalize_messages(self, text):
+        return NORMALIZE_PROMPT.messages(tagged("TEXT", text))
+
+    def _chunk_messages(self, chunk):
+        context = [tagged("CONTEXT", chunk["context"])] if chunk["context"] else []
+        return NORMALIZE_PROMPT.messages(*context, tagged("TEXT", chunk["text"]))
+
+    @staticmethod
+    def _output_budget(text, floor):
+        # Corrections are about as long as the input; leave headroom for tokenizer differences.
+        return max(floor, int(estimate_tokens(text) * 1.5) + 64)
+
+    def _split(self, text, chunked):
+        """Chunks for chunked mode; ``chunked=None`` chunks only texts over ``chunk_tokens``."""
+        if chunked is None:
+            chunked = estimate_tokens(text) > self.chunk_tokens
+        return split_for_correction(text, self.chunk_tokens, self.chunk_overlap_tokens) if chunked else []
+
+    def _correct_chunk(self, chunk):
+        return self.call_openai(self._chunk_messages(chunk), max_tokens=self._output_budget(chunk["text"], 256))
+
+    def _stitch(self, chunks, replies):
+        outputs = [(r.content or "").strip().removeprefix("<TEXT>").removesuffix("</TEXT>") for r in replies]
+        return ChatCompletionMessage(role="assistant", content=stitch(chunks, outputs))
+
+    def execute(self, text, chunked=None):
+        text, _ = self.canonicalize_places(text)
+        chunks = self._split(text, chunked)
+        if len(chunks) <= 1:
+            return self.call_openai(self._normalize_messages(text), max_tokens=self._output_budget(text, 800))
+        with ThreadPoolExecutor(max_workers=min(settings.LLM_CONCURRENCY, len(chunks))) as pool:
+            futures = [pool.submit(in_context(self._correct_chunk), c) for c in chunks]
+            replies = [f.result() for f in futures]
+        return self._stitch(chunks, replies)
+
+    async def aexecute(self, text, chunked=None):
+        text, _ = self.canonicalize_places(text)
+        chunks = self._split(text, chunked)
+        if len(chunks) <= 1:
+            return await self.acall_openai(self._normalize_messages(text), max_tokens=self._output_budget(text, 800))
+        replies = await asyncio.gather(*(
+            self.acall_openai(self._chunk_messages(c), max_tokens=self._output_budget(c["text"], 256))
+            for c in chunks
+        ))
+        return self._stitch(chunks, replies)
+
+    def _report_messages(self, text):
+        return REPORT_PROMPT.messages(tagged("TEXT", text))
+
+    def _format_report(self, changes, report):
+        report_text = report.content if hasattr(report, "content") else str(report)
+        return (
+            "**Place name corrections (local, rapidfuzz):**\n\n"
+            f"{format_place_changes(changes)}\n\n"
+            f"{report_text}"
+        )
+
     def generate_report(self, text):
-        districts = self.district_list
-        communes  = self.commune_list
-
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are an expert editor. First, canonicalize any district/commune names to the exact spelling "
-                    "from the allowed lists. Do not invent names. Then fix grammar and style. "
-                    "Report changes precisely, explain why you made them, and return the final corrected text."
-                )
-            },
-            {
-                "role": "user",
-                "content": (
-                    "ALLOWED CANONICAL NAMES (use exact spelling and capitalization):\n"
-                    f"- Districts: {districts}\n"
-                    f"- Communes: {communes}\n\n"
-                    "TASKS (do all):\n"
-                    "A) Identify ONLY the tokens/phrases you actually changed that are district/commune names.\n"
-                    "   Output a markdown table with EXACTLY these columns:\n"
-                    "   | Entity Type | Original Span | Corrected Canonical Name | Reason for Change |\n"
-                    "   - Entity Type is 'District' or 'Commune'.\n"
-                    "   - If no such changes, output a single row: (None) | (None) | (None) | (None).\n\n"
-                    "B) For other grammar/style improvements, output a markdown table with EXACTLY these columns:\n"
-                    "   | Original Phrase | Improved Phrase | Reason for Change |\n"
-                    "   - Only include rows where you changed something.\n"
-                    "   - If none, include one row: (None) | No changes needed | (None).\n"
-                    "   - The Reason for Change column must briefly explain why the improvement was made "
-                    "(e.g., spelling correction, grammar fix, clarity, professional tone).\n\n"
-                    "C) After the tables, print a heading 'Full corrected text:' followed by ONLY the final corrected text.\n"
-                    "   Do not wrap in code fences.\n\n"
-                    "CONSTRAINTS:\n"
-                    "• Case-insensitive matching for names, tolerate minor typos.\n"
-                    "• Replace with EXACT spelling from the lists.\n"
-                    "• Never invent or guess a new place name. If uncertain, leave as-is and do not list as a change.\n"
-                    "• Keep meaning intact.\n\n"
-                    "TEXT:\n"
-                    "<TEXT>\n"
-                    f"{text}\n"
-                    "</TEXT>"
-                )
-            }
-        ]
-        report = self.call_openai(messages, max_tokens=2000)
-        return report
-
-
-            
\ No newline at end of file
+        text, changes = self.canonicalize_places(text)
+        report = self.call_openai(self._report_messages(text), max_tokens=2000)
+        return self._format_report(changes, report)
+
+    async def agenerate_report(self, text):
+        text, changes = self.canonicalize_places(text)
+        report = await self.acall_openai(self._report_messages(text), max_tokens=2000)
+        return self._format_report(changes, report)
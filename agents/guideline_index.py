@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import re
+import numpy as np
+from loguru import logger
+
+from .settings import CACHE_DIR
+from .guideline_store import sha256_file
+from .text_chunking import estimate_tokens
+
+INDEX_VERSION = 2
+INDEX_DIR = os.path.join(CACHE_DIR, "guideline_index")
+
+_TOKEN = re.compile(r"[^\W\d_]{2,}")
+_STOPWORDS = set(
+    "the and for with that this you your are was were from have has had not but all any can will "
+    "our their they them its into about which what when where who how why also such other than "
+    "then there these those been being would should could may might must each more most some only "
+    "les des une pour que qui dans par sur vos votre est aux ces".split()
+)
+
+
+def tokenize(text):
+    return [t for t in (m.group(0).lower() for m in _TOKEN.finditer(text)) if t not in _STOPWORDS]
+
+
+def chunk_pages(pages, source, chunk_words=80, overlap_words=15):
+    """Split page texts into ~chunk_words-word chunks on line boundaries, with a word overlap."""
+    chunks = []
+    for page_no, page_text in enumerate(pages, start=1):
+        lines = [ln.strip() for ln in page_text.splitlines() if ln.strip()]
+        current = []
+        for line in lines:
+            current.extend(line.split())
+            current.append("\n")
+            if sum(1 for w in current if w != "\n") >= chunk_words:
+                chunks.append({"source": source, "page": page_no, "text": _join(current)})
+                words = [w for w in current if w != "\n"]
+                current = words[-overlap_words:] if overlap_words else []
+        if any(w != "\n" for w in current):
+            chunks.append({"source": source, "page": page_no, "text": _join(current)})
+    return chunks
+
+
+def _join(words):
+    return " ".join(words).replace(" \n ", "\n").replace(" \n", "\n").strip()
+
+
+class GuidelineIndex:
+    """BM25 index over guideline chunks, stored as a dense NumPy weight matrix.
+
+    ``weights[d, t]`` is the BM25 contribution of term ``t`` to chunk ``d``, so scoring
+    a query is a column gather and a row sum.
+    """
+
+    def __init__(self, chunks, vocab, weights):
+        self.chunks = chunks
+        self.vocab = vocab
+        self.term_ids = {t: i for i, t in enumerate(vocab)}
+        self.weights = weights
+        self.key = None  # set by load_or_build: identifies the source PDFs and chunking
+
+    @classmethod
+    def build(cls, chunks, k1=1.5, b=0.75):
+        docs = [tokenize(c["text"]) for c in chunks]
+        vocab = sorted({t for doc in docs for t in doc})
+        term_ids = {t: i for i, t in enumerate(vocab)}
+        tf = np.zeros((len(docs), len(vocab)), dtype=np.float32)
+        for d, doc in enumerate(docs):
+            for t in doc:
+                tf[d, term_ids[t]] += 1
+        doc_len = tf.sum(axis=1, keepdims=True)
+        avg_len = float(doc_len.mean()) if len(docs) else 0.0
+        df = (tf > 0).sum(axis=0)
+        idf = np.log(1.0 + (len(docs) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * doc_len / max(avg_len, 1e-9))
+        weights = idf * tf * (k1 + 1) / (tf + norm)
+        return cls(chunks, vocab, weights.astype(np.float32))
+
+    @classmethod
+    def load_or_build(cls, pdf_paths, extract_pages, chunk_words=80, overlap_words=15):
+        """Load the persisted index for these PDFs, or build and persist it.
+
+        ``extract_pages(path)`` returns a list of page texts; it only runs on a cache miss.
+        The cache key covers the PDFs' SHA-256 and the chunking parameters.
+        """
+        key_src = json.dumps({
+            "version": INDEX_VERSION,
+            "pdfs": [[os.path.basename(p), sha256_file(p)] for p in pdf_paths],
+            "chunk_words": chunk_words,
+            "overlap_words": overlap_words,
+        }, sort_keys=True)
+        key = hashlib.sha256(key_src.encode("utf-8")).hexdigest()[:24]
+        base = os.path.join(INDEX_DIR, key)
+        try:
+            index = cls.load(base)
+            index.key = key
+            logger.info(f"[GuidelineIndex] Loaded {len(index.chunks)} chunks from {base}.npz")
+            return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+        chunks = []
+        for path in pdf_paths:
+            chunks.extend(chunk_pages(extract_pages(path), os.path.basename(path), chunk_words, overlap_words))
+        index = cls.build(chunks)
+        index.key = key
+        try:
+            index.save(base)
+        except OSError as e:
+            logger.warning(f"[GuidelineIndex] Could not persist index: {e}")
+        logger.info(f"[GuidelineIndex] Built {len(chunks)} chunks / {len(index.vocab)} terms")
+        return index
+
+    def save(self, base):
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        tmp_npz, tmp_json = f"{base}.tmp.npz", f"{base}.tmp.json"
+        np.savez_compressed(tmp_npz, weights=self.weights, vocab=np.array(self.vocab, dtype=str))
+        with open(tmp_json, "w", encoding="utf-8") as f:
+            json.dump(self.chunks, f, ensure_ascii=False)
+        os.replace(tmp_npz, f"{base}.npz")
+        os.replace(tmp_json, f"{base}.json")
+
+    @classmethod
+    def load(cls, base):
+        with np.load(f"{base}.npz", allow_pickle=False) as data:
+            weights = data["weights"]
+            vocab = data["vocab"].tolist()
+        with open(f"{base}.json", "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        return cls(chunks, vocab, weights)
+
+    def score(self, query):
+        ids = [self.term_ids[t] for t in tokenize(query) if t in self.term_ids]
+        if not ids:
+            return np.zeros(len(self.chunks), dtype=np.float32)
+        return self.weights[:, ids].sum(axis=1)
+
+    def search(self, query, top_k=5):
+        """Top-k ``(chunk_index, score)`` with a positive score, best first."""
+        scores = self.score(query)
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [(int(i), float(scores[i])) for i in order if scores[i] > 0]
+
+    def select_ids(self, queries, top_k=8, token_budget=1500, exclude=()):
+        """Indices of chunks relevant to any of ``queries`` that fit in ``token_budget``, in document order.
+
+        Queries take turns picking their next best unused chunk, so every detected
+        section gets guideline coverage before any one section gets a second chunk.
+        Chunks in ``exclude`` (indices) are never picked.
+        """
+        ranked = [self.search(q, top_k=top_k + len(exclude)) for q in queries]
+        chosen, used = [], 0
+        for rank in range(top_k + len(exclude)):
+            for hits in ranked:
+                if rank >= len(hits) or len(chosen) >= top_k:
+                    continue
+                idx = hits[rank][0]
+                if idx in chosen or idx in exclude:
+                    continue
+                cost = estimate_tokens(self.chunks[idx]["text"])
+                if used + cost > token_budget:
+                    continue
+                chosen.append(idx)
+                used += cost
+        return sorted(chosen)
+
+    def select(self, queries, top_k=8, token_budget=1500, exclude=()):
+        return [self.chunks[i] for i in self.select_ids(queries, top_k, token_budget, exclude)]
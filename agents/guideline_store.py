@@ -0,0 +1,112 @@
+"""Extracted guideline text, cached on disk and keyed by the PDF's SHA-256.
+
+Build (or refresh) the artifacts ahead of time with ``python -m agents.build_guidelines``.
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from loguru import logger
+
+from .pdf_backends import extract_pages, get_backend
+from .settings import CACHE_DIR, GUIDELINE_DIR
+
+ARTIFACT_VERSION = 2
+ARTIFACT_DIR = os.path.join(CACHE_DIR, "guideline_text")
+
+_PAGE_FOOTER = re.compile(r"^\d+\s*/\s*\d+$")
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def guideline_pdfs(guideline_dir=None):
+    """Sorted guideline PDF paths under ``guideline_dir`` (defaults to settings.GUIDELINE_DIR)."""
+    return sorted(glob.glob(os.path.join(guideline_dir or GUIDELINE_DIR, "*.pdf")))
+
+
+def _is_heading(line):
+    words = line.split()
+    if not words or len(words) > 10 or _PAGE_FOOTER.match(line):
+        return False
+    if line.endswith(":"):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    if len(letters) >= 4 and all(c.isupper() for c in letters):
+        return True
+    return line[0].isupper() and not line.endswith((".", ",", ";", ")")) and len(words) <= 6
+
+
+def extract_artifact(pdf_path, sha256=None):
+    """Extract the text of ``pdf_path`` with page offsets and heading positions."""
+    backend = get_backend()
+    pages = extract_pages(pdf_path, backend=backend)
+
+    parts, page_spans, headings = [], [], []
+    offset = 0
+    for page_no, page_text in enumerate(pages, start=1):
+        start = offset
+        line_offset = offset
+        for line in page_text.split("\n"):
+            stripped = line.strip()
+            if _is_heading(stripped):
+                headings.append({"text": stripped.rstrip(":").strip(), "page": page_no, "offset": line_offset})
+            line_offset += len(line) + 1
+        parts.append(page_text)
+        parts.append("\n")
+        offset += len(page_text) + 1
+        page_spans.append({"page": page_no, "start": start, "end": start + len(page_text)})
+
+    return {
+        "version": ARTIFACT_VERSION,
+        "source": os.path.basename(pdf_path),
+        "backend": backend.name,
+        "sha256": sha256 or sha256_file(pdf_path),
+        "text": "".join(parts),
+        "pages": page_spans,
+        "headings": headings,
+    }
+
+
+def _artifact_path(pdf_path, sha256):
+    return os.path.join(ARTIFACT_DIR, f"{os.path.basename(pdf_path)}.{sha256[:16]}.json")
+
+
+def load_guideline_artifact(pdf_path, force=False):
+    """Cached artifact for ``pdf_path``; the PDF is only re-extracted when its content changes."""
+    sha256 = sha256_file(pdf_path)
+    path = _artifact_path(pdf_path, sha256)
+    if not force:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                artifact = json.load(f)
+            if artifact.get("version") == ARTIFACT_VERSION and artifact.get("sha256") == sha256:
+                return artifact
+        except (OSError, ValueError):
+            pass
+
+    start = time.perf_counter()
+    artifact = extract_artifact(pdf_path, sha256=sha256)
+    logger.info(f"[GuidelineStore] Extracted {artifact['source']} in {time.perf_counter() - start:.3f}s")
+    try:
+        os.makedirs(ARTIFACT_DIR, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(artifact, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"[GuidelineStore] Could not persist artifact for {pdf_path}: {e}")
+    return artifact
+
+
+def page_texts(artifact):
+    text = artifact["text"]
+    return [text[p["start"]:p["end"]] for p in artifact["pages"]]
+
@@ -0,0 +1,148 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import settings
+from .agent_base import in_context
+from .cv_recommendations import merge_sections
+from .cv_sections import segment_cv
+from .pipeline import content_hash
+
+
+def _rejoin(original, output):
+    # Stage outputs are stripped; put back the whitespace that followed the segment.
+    stripped = original.rstrip()
+    return output.strip() + original[len(stripped):]
+
+
+def resegment(text, like):
+    """``text`` (a processed version of segment ``like``) as a segment of the same section."""
+    stripped = text.strip()
+    if not like["heading"]:
+        return {"section": like["section"], "heading": "", "body": stripped, "text": text}
+    heading, _, body = stripped.partition("\n")
+    return {"section": like["section"], "heading": heading.strip(), "body": body.strip(), "text": text}
+
+
+class SegmentFailed(Exception):
+    def __init__(self, stage, error):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class IncrementalResult:
+    def __init__(self):
+        self.segments = []          # per segment: {"key", "grammar", "anonymize", "section", "reused"}
+        self.recommendations = None
+        self.structure_reused = False
+        self.failed_stage = None
+        self.error = None
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def recomputed(self):
+        return sum(not s["reused"] for s in self.segments)
+
+    @property
+    def reused(self):
+        return sum(s["reused"] for s in self.segments)
+
+    @property
+    def grammar(self):
+        return "".join(s["grammar"] for s in self.segments)
+
+    @property
+    def anonymized(self):
+        return "".join(s["anonymize"] for s in self.segments)
+
+
+class IncrementalCVReview:
+    """Grammar → anonymize → per-section recommendation, redone only for segments that changed.
+
+    The CV is split with ``segment_cv`` and each segment is keyed by its text and the
+    stage/agent config versions. Segments whose key was in the previous run (kept in
+    ``state``, e.g. a Streamlit session dict) reuse its outputs; the rest go through
+    ``pipeline`` and ``recommender.recommend_section`` concurrently. Stage outputs also
+    land in the pipeline's text store, so edits reverted later are found there.
+    """
+
+    def __init__(self, pipeline, recommender, state=None):
+        self.pipeline = pipeline
+        self.recommender = recommender
+        self.state = {} if state is None else state
+        self._version = content_hash("\0".join([s.version for s in pipeline.stages] + [recommender.cache_version]))
+
+    def _segment_key(self, segment):
+        return content_hash(f"{self._version}\0{segment['section']}\0{segment['text'].strip()}")
+
+    def _process(self, segment, key):
+        result = self.pipeline.run(segment["text"])
+        if not result.ok:
+            raise SegmentFailed(result.failed_stage, result.error)
+        grammar, anonymized = result.outputs["grammar"], result.outputs["anonymize"]
+        try:
+            section = self.recommender.recommend_section(resegment(anonymized, segment))
+        except Exception as e:
+            raise SegmentFailed("recommend", e) from e
+        return {"key": key, "grammar": _rejoin(segment["text"], grammar),
+                "anonymize": _rejoin(segment["text"], anonymized), "section": section, "reused": False}
+
+    def run(self, text, on_section=None):
+        """Returns an IncrementalResult; ``on_section(index, section)`` fires in this thread per segment."""
+        start = time.perf_counter()
+        result = IncrementalResult()
+        segments = segment_cv(text)
+        previous = self.state.get("segments", {})
+        outputs = [None] * len(segments)
+        todo = []
+        for i, seg in enumerate(segments):
+            key = self._segment_key(seg)
+            if key in previous:
+                outputs[i] = {**previous[key], "reused": True}
+                if on_section:
+                    on_section(i, outputs[i]["section"])
+            else:
+                todo.append((i, seg, key))
+
+        if todo:
+            with ThreadPoolExecutor(max_workers=min(settings.LLM_CONCURRENCY, len(todo))) as pool:
+                futures = {pool.submit(in_context(self._process), seg, key): i for i, seg, key in todo}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        outputs[i] = future.result()
+                    except SegmentFailed as e:
+                        if result.error is None:
+                            result.failed_stage, result.error = e.stage, e.error
+                        continue
+                    if on_section:
+                        on_section(i, outputs[i]["section"])
+        result.segments = [o for o in outputs if o is not None]
+        if result.error is None:
+            try:
+                result.recommendations = self._recommendations(segments, result)
+            except Exception as e:
+                result.failed_stage, result.error = "recommend", e
+        # Keep what succeeded, so a retry after a failure only redoes the rest.
+        self.state["segments"] = {o["key"]: {k: v for k, v in o.items() if k != "reused"}
+                                  for o in result.segments}
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def _recommendations(self, segments, result):
+        anonymized = [resegment(o["anonymize"], seg) for seg, o in zip(segments, result.segments)]
+        # The structure call only sees headings and opening lines; reuse it while those are unchanged.
+        structure_key = content_hash(json.dumps(self.recommender._structure_messages(anonymized)))
+        cached = self.state.get("structure")
+        if cached and cached["key"] == structure_key:
+            structure = cached["value"]
+            result.structure_reused = True
+        else:
+            structure = self.recommender.recommend_structure(anonymized)
+            self.state["structure"] = {"key": structure_key, "value": structure}
+        return merge_sections([o["section"] for o in result.segments], structure)
@@ -0,0 +1,128 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+
+DEFAULT_BACKEND = os.getenv("PATHWAY_PDF_BACKEND", "pymupdf")
+# Documents with at least this many pages are split across a process pool.
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("PATHWAY_PDF_PARALLEL_PAGES", "32"))
+
+
+def read_source(source):
+    """Normalize a document source: paths are kept, bytes-like and file-like objects become bytes."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "read"):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        data = source.read()
+        return data if isinstance(data, bytes) else bytes(data)
+    raise TypeError(f"Unsupported document source type: {type(source).__name__}")
+
+
+def _describe(source):
+    return source if isinstance(source, str) else f"<{len(source)} bytes in memory>"
+
+
+class PyMuPDFBackend:
+    name = "pymupdf"
+
+    def __init__(self):
+        import fitz
+        self._fitz = fitz
+
+    def _open(self, source):
+        if isinstance(source, bytes):
+            return self._fitz.open(stream=source, filetype="pdf")
+        return self._fitz.open(source)
+
+    def page_count(self, source):
+        with self._open(source) as doc:
+            return doc.page_count
+
+    def extract_pages(self, source, start=0, end=None):
+        # sort=True orders text blocks by position, matching pdfplumber's reading order.
+        with self._open(source) as doc:
+            end = doc.page_count if end is None else min(end, doc.page_count)
+            return [doc.load_page(i).get_text("text", sort=True).rstrip("\n") for i in range(start, end)]
+
+
+class PdfPlumberBackend:
+    name = "pdfplumber"
+
+    def __init__(self):
+        import pdfplumber
+        self._pdfplumber = pdfplumber
+
+    def _open(self, source):
+        return self._pdfplumber.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+    def page_count(self, source):
+        with self._open(source) as pdf:
+            return len(pdf.pages)
+
+    def extract_pages(self, source, start=0, end=None):
+        with self._open(source) as pdf:
+            return [page.extract_text() or "" for page in pdf.pages[start:end]]
+
+
+BACKENDS = {
+    PyMuPDFBackend.name: PyMuPDFBackend,
+    PdfPlumberBackend.name: PdfPlumberBackend,
+}
+FALLBACK_BACKEND = PdfPlumberBackend.name
+
+
+def get_backend(name=None):
+    """Instantiate a backend by name, falling back to pdfplumber when PyMuPDF is unavailable."""
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    try:
+        return BACKENDS[name]()
+    except ImportError as e:
+        if name == FALLBACK_BACKEND:
+            raise
+        logger.warning(f"[PDF] Backend '{name}' unavailable ({e}); using '{FALLBACK_BACKEND}'")
+        return BACKENDS[FALLBACK_BACKEND]()
+
+
+def _extract_range(backend_name, source, start, end):
+    return get_backend(backend_name).extract_pages(source, start, end)
+
+
+def _extract_parallel(backend, source, n_pages, max_workers):
+    workers = max_workers or min(os.cpu_count() or 1, 8)
+    step = -(-n_pages // workers)
+    ranges = [(s, min(s + step, n_pages)) for s in range(0, n_pages, step)]
+    with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+        futures = [pool.submit(_extract_range, backend.name, source, s, e) for s, e in ranges]
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+    return pages
+
+
+def extract_pages(source, backend=None, parallel_threshold=None, max_workers=None):
+    """Page texts of a PDF, in order.
+
+    ``source`` is a path, bytes, or a binary file-like object (e.g. a Streamlit upload);
+    in-memory sources are parsed without touching the disk. Large documents are split into contiguous page ranges extracted in separate
+    processes. If the chosen backend fails on a document, pdfplumber is tried once.
+    """
+    backend = backend if hasattr(backend, "extract_pages") else get_backend(backend)
+    source = read_source(source)
+    threshold = PARALLEL_PAGE_THRESHOLD if parallel_threshold is None else parallel_threshold
+    try:
+        n_pages = backend.page_count(source)
+        if threshold and n_pages >= threshold and (max_workers or os.cpu_count() or 1) > 1:
+            return _extract_parallel(backend, source, n_pages, max_workers)
+        return backend.extract_pages(source)
+    except Exception as e:
+        if backend.name == FALLBACK_BACKEND:
+            raise
+        logger.warning(f"[PDF] '{backend.name}' failed on {_describe(source)}: {e}; "
+                       f"retrying with '{FALLBACK_BACKEND}'")
+        return get_backend(FALLBACK_BACKEND).extract_pages(source)
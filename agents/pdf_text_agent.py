@@ -1,14 +1,14 @@
-import pdfplumber
 from .agent_base import AgentBase
+from .pdf_backends import extract_pages, get_backend
 
 class PDFTextAgent(AgentBase):
-    def __init__(self):
+    def __init__(self, backend=None):
         super().__init__(name="PDFTextAgent")
+        self.backend = get_backend(backend)
 
-    def extract_text(self, pdf_path):
-        text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                pg_txt = page.extract_text() or ""
-                text += pg_txt + "\n"
-        return text
+    def extract_pages(self, source):
+        """Page texts from a path, bytes, or binary file-like object."""
+        return extract_pages(source, backend=self.backend)
+
+    def extract_text(self, source):
+        return "".join(page + "\n" for page in self.extract_pages(source))
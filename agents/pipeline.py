@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import threading
+import time
+from loguru import logger
+
+from .settings import MODEL
+from .text_store import default_text_store
+
+# Pipeline stage name -> AgentManager agent name.
+AGENT_STAGES = {
+    "grammar": "grammar_checker",
+    "anonymize": "text_anonymizer",
+    "recommend": "cv_recommender",
+}
+DEFAULT_STAGES = ("grammar", "anonymize", "recommend")
+
+
+def content_hash(value):
+    data = value if isinstance(value, (bytes, bytearray)) else str(value).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def _as_text(output):
+    # LLM agents return a ChatCompletionMessage, the others plain strings.
+    if isinstance(output, str):
+        return output
+    if hasattr(output, "content"):
+        return str(output.content)
+    return str(output)
+
+
+class Stage:
+    """One step of a pipeline: ``run(value) -> str`` plus an optional coroutine twin.
+
+    ``cpu_bound`` runs go to the pipeline's executor; ``version`` is part of the stored-output key.
+    """
+
+    def __init__(self, name, run, arun=None, cpu_bound=False, cache=True, version="", persist=True):
+        self.name = name
+        self.run = run
+        self.arun = arun
+        self.cpu_bound = cpu_bound
+        self.cache = cache
+        self.version = version
+        self.persist = persist
+
+    @classmethod
+    def from_agent(cls, name, agent, **kwargs):
+        kwargs.setdefault("version", getattr(agent, "cache_version", None) or f"{type(agent).__name__}:{MODEL}")
+        kwargs.setdefault("persist", getattr(agent, "persist_responses", True))
+        return cls(name, agent.execute, arun=getattr(agent, "aexecute", None), **kwargs)
+
+
+class PipelineResult:
+    def __init__(self, value):
+        self.input = value
+        self.outputs = {}
+        self.timings = {}
+        self.cached = []
+        self.failed_stage = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def output(self):
+        """Output of the last stage that ran."""
+        return next(reversed(self.outputs.values()), None)
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "outputs": dict(self.outputs),
+            "timings": {k: round(v, 4) for k, v in self.timings.items()},
+            "cached": list(self.cached),
+            "failed_stage": self.failed_stage,
+            "error": str(self.error) if self.error else None,
+        }
+
+
+class Pipeline:
+    """Runs text through a sequence of stages, stopping at the first failure.
+
+    Stage outputs are stored by stage version and input hash, so no text goes through a stage twice.
+    """
+
+    def __init__(self, stages, cache=None, executor=None, max_in_flight=4):
+        self.stages = list(stages)
+        # cache=False disables caching; by default every pipeline shares the process-wide text store.
+        self.cache = None if cache is False else cache if cache is not None else default_text_store()
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self.stats = {s.name: {"calls": 0, "cache_hits": 0, "failures": 0, "total_seconds": 0.0}
+                      for s in self.stages}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_manager(cls, manager, stages=DEFAULT_STAGES, **kwargs):
+        return cls([Stage.from_agent(name, manager.get_agent(AGENT_STAGES[name])) for name in stages], **kwargs)
+
+    def _select(self, until):
+        if until is None:
+            return self.stages
+        names = [s.name for s in self.stages]
+        if until not in names:
+            raise ValueError(f"Unknown stage '{until}'. Stages: {names}")
+        return self.stages[:names.index(until) + 1]
+
+    def _cache_key(self, stage, value):
+        return hashlib.sha256(f"{stage.name}\0{stage.version}\0{content_hash(value)}".encode("utf-8")).hexdigest()
+
+    def _cached(self, stage, value):
+        if not stage.cache or self.cache is None:
+            return None, None
+        key = self._cache_key(stage, value)
+        return key, self.cache.get(key)
+
+    def _record(self, result, stage, elapsed, output=None, cached=False, error=None):
+        result.timings[stage.name] = elapsed
+        with self._stats_lock:
+            stats = self.stats[stage.name]
+            stats["calls"] += 1
+            stats["total_seconds"] += elapsed
+            stats["cache_hits"] += cached
+            stats["failures"] += error is not None
+        if error is not None:
+            logger.error(f"[Pipeline] Stage '{stage.name}' failed: {error}")
+            result.failed_stage, result.error = stage.name, error
+            return
+        result.outputs[stage.name] = output
+        if cached:
+            result.cached.append(stage.name)
+
+    def run(self, value, until=None, on_stage=None):
+        """Run the stages (up to and including ``until``) and return a PipelineResult.
+
+        ``on_stage(name, result)`` is called after every stage that succeeds.
+        """
+        result = PipelineResult(value)
+        for stage in self._select(until):
+            start = time.perf_counter()
+            key, output = self._cached(stage, value)
+            cached = output is not None
+            try:
+                if not cached:
+                    output = _as_text(stage.run(value))
+            except Exception as e:
+                self._record(result, stage, time.perf_counter() - start, error=e)
+                break
+            if key and not cached:
+                self.cache.set(key, output, persist=stage.persist)
+            self._record(result, stage, time.perf_counter() - start, output, cached)
+            if on_stage:
+                on_stage(stage.name, result)
+            value = output
+        return result
+
+    async def _arun_stage(self, stage, value):
+        if stage.arun is not None:
+            return await stage.arun(value)
+        if stage.cpu_bound and self.executor is not None:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, stage.run, value)
+        return await asyncio.to_thread(stage.run, value)
+
+    async def arun(self, value, until=None, on_stage=None):
+        result = PipelineResult(value)
+        for stage in self._select(until):
+            start = time.perf_counter()
+            key, output = self._cached(stage, value)
+            cached = output is not None
+            try:
+                if not cached:
+                    output = _as_text(await self._arun_stage(stage, value))
+            except Exception as e:
+                self._record(result, stage, time.perf_counter() - start, error=e)
+                break
+            if key and not cached:
+                self.cache.set(key, output, persist=stage.persist)
+            self._record(result, stage, time.perf_counter() - start, output, cached)
+            if on_stage:
+                on_stage(stage.name, result)
+            value = output
+        return result
+
+    async def arun_many(self, values, until=None, overlap=True, on_result=None):
+        """Results in input order; ``on_result(index, result)`` fires as each document finishes."""
+        in_flight = asyncio.Semaphore(self.max_in_flight if overlap else 1)
+
+        async def one(index, value):
+            async with in_flight:
+                result = await self.arun(value, until=until)
+            if on_result:
+                on_result(index, result)
+            return result
+
+        return await asyncio.gather(*(one(i, v) for i, v in enumerate(values)))
+
+    def run_many(self, values, until=None, overlap=True, on_result=None):
+        return asyncio.run(self.arun_many(values, until=until, overlap=overlap, on_result=on_result))
+
+    def report(self):
+        """Per-stage calls, cache hits, failures and mean seconds."""
+        with self._stats_lock:
+            return {name: {**s, "mean_seconds": s["total_seconds"] / s["calls"] if s["calls"] else 0.0}
+                    for name, s in self.stats.items()}
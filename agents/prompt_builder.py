@@ -0,0 +1,69 @@
+import hashlib
+
+from .text_chunking import estimate_tokens
+
+
+class PromptTemplate:
+    """Chat prompt split into a byte-stable static prefix and a per-call suffix.
+
+    Everything that is identical on every call (role, rules, output format, fixed
+    reference text) is joined once into the system message, so providers can serve
+    it from their prompt cache. Per-call parts (the document, retrieved excerpts,
+    counts) only ever appear in the user message that follows it.
+    """
+
+    def __init__(self, name, *static_parts):
+        self.name = name
+        self.static_prefix = "\n\n".join(p.strip() for p in static_parts if p and p.strip())
+        self.prefix_hash = hashlib.sha256(self.static_prefix.encode("utf-8")).hexdigest()[:12]
+        self.static_tokens = estimate_tokens(self.static_prefix)
+
+    def messages(self, *dynamic_parts):
+        return [
+            {"role": "system", "content": self.static_prefix},
+            {"role": "user", "content": "\n\n".join(p for p in dynamic_parts if p)},
+        ]
+
+
+def tagged(label, text):
+    """Per-call text wrapped in explicit tags, e.g. <TEXT>...</TEXT>."""
+    return f"<{label}>\n{text}\n</{label}>"
+
+
+def prompt_report(messages, usage=None, source="api"):
+    """Static (system) vs. dynamic prompt tokens for one call, plus the provider's cached tokens.
+
+    Without ``usage`` the split is a chars/4 estimate. With it, the provider's exact
+    ``prompt_tokens`` are split in the same proportion and ``cached_tokens`` comes from
+    ``usage.prompt_tokens_details``.
+    """
+    static_text = "".join(str(m.get("content") or "") for m in messages if m.get("role") == "system")
+    dynamic_text = "".join(str(m.get("content") or "") for m in messages if m.get("role") != "system")
+    static, dynamic = estimate_tokens(static_text), estimate_tokens(dynamic_text)
+    report = {
+        "source": source,
+        "prefix_hash": hashlib.sha256(static_text.encode("utf-8")).hexdigest()[:12],
+        "static_tokens": static,
+        "dynamic_tokens": dynamic,
+        "prompt_tokens": None,
+        "cached_tokens": 0,
+        "completion_tokens": None,
+    }
+    if usage is not None and getattr(usage, "prompt_tokens", None):
+        total = usage.prompt_tokens
+        report["static_tokens"] = min(total, round(total * static / max(1, static + dynamic)))
+        report["dynamic_tokens"] = total - report["static_tokens"]
+        report["prompt_tokens"] = total
+        details = getattr(usage, "prompt_tokens_details", None)
+        report["cached_tokens"] = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        report["completion_tokens"] = getattr(usage, "completion_tokens", None)
+    return report
+
+
+def combine_prompt_reports(reports):
+    """Token totals of the reports for calls that reached the API (None if there were none)."""
+    sent = [r for r in reports if r["source"] == "api"]
+    if not sent:
+        return None
+    return {key: sum(r[key] or 0 for r in sent)
+            for key in ("static_tokens", "dynamic_tokens", "prompt_tokens", "cached_tokens", "completion_tokens")}
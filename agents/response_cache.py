@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from loguru import logger
+
+from .settings import CACHE_DIR
+
+
+def make_cache_key(model, messages, temperature, max_tokens, **extra):
+    """Stable SHA-256 of everything that determines a completion."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    payload.update(extra)
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """In-memory tier: bounded, least-recently-used entries are dropped first."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """On-disk tier: JSON values in SQLite with a TTL and a cap on the number of rows.
+
+    Opening a file written under an older ``version`` drops all of its rows.
+    """
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=5000, version=0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            stored = conn.execute("PRAGMA user_version").fetchone()[0]
+            if stored < version:
+                dropped = conn.execute("DELETE FROM responses").rowcount
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                logger.info(f"[SQLiteCache] {path}: version {stored} -> {version}, dropped {dropped} rows")
+
+    def _connect(self):
+        # One short-lived connection per operation keeps the cache usable from any thread.
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            if self.ttl_seconds is not None:
+                conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """Two-tier response cache (memory, then disk) with hit/miss counters.
+
+    Either tier may be ``None``. Disk hits are promoted into the memory tier.
+    """
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def get(self, key):
+        if self.memory is not None:
+            value = self.memory.get(key)
+            if value is not None:
+                self._count("memory_hits")
+                return value
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"[ResponseCache] Disk read failed: {e}")
+                self._count("errors")
+                value = None
+            if value is not None:
+                self._count("disk_hits")
+                if self.memory is not None:
+                    self.memory.set(key, value)
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key, value, persist=True):
+        """With ``persist=False`` the value is only kept in the memory tier."""
+        if self.memory is not None:
+            self.memory.set(key, value)
+        if persist and self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                logger.warning(f"[ResponseCache] Disk write failed: {e}")
+                self._count("errors")
+        self._count("stores")
+
+    def clear(self):
+        for tier in (self.memory, self.disk):
+            if tier is not None:
+                tier.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_response_cache():
+    """Process-wide cache shared by every agent; ``PATHWAY_RESPONSE_CACHE=0`` disables it."""
+    global _default_cache
+    if os.getenv("PATHWAY_RESPONSE_CACHE", "1") == "0":
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ResponseCache(
+                    memory=LRUCache(max_entries=int(os.getenv("PATHWAY_RESPONSE_CACHE_MEMORY_ENTRIES", "256"))),
+                    disk=SQLiteCache(
+                        os.path.join(CACHE_DIR, "openai_responses.sqlite"),
+                        ttl_seconds=float(os.getenv("PATHWAY_RESPONSE_CACHE_TTL", str(7 * 24 * 3600))),
+                        max_entries=int(os.getenv("PATHWAY_RESPONSE_CACHE_DISK_ENTRIES", "5000")),
+                        # 1: purges grammar replies persisted before they were kept in memory only.
+                        version=1,
+                    ),
+                )
+    return _default_cache
@@ -0,0 +1,145 @@
+import itertools
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import openai
+
+# Statuses worth retrying: timeouts, conflicts, rate limits and server-side failures.
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised without contacting the endpoint while the circuit breaker is open."""
+
+
+def _status_code(exc):
+    return getattr(exc, "status_code", None)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter that honours Retry-After.
+
+    The delay before attempt ``n + 1`` is ``uniform(0, min(max_delay, base_delay * 2 ** (n - 1)))``,
+    raised to the server's Retry-After when one is sent (capped at ``max_retry_after``).
+    """
+
+    def __init__(self, base_delay=0.5, max_delay=20.0, max_retry_after=60.0, timeout=60.0, rng=None):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.timeout = timeout
+        self._rng = rng or random.Random()
+
+    def is_retryable(self, exc):
+        if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+            return True
+        if isinstance(exc, openai.APIStatusError):
+            status = _status_code(exc)
+            return status in RETRYABLE_STATUS_CODES or (status is not None and status >= 500)
+        return False
+
+    def retry_after(self, exc):
+        """Seconds requested by the server via retry-after-ms / Retry-After, if any."""
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            try:
+                return float(value) / 1000.0
+            except ValueError:
+                pass
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def backoff(self, attempt):
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return self._rng.uniform(0, cap)
+
+    def delay(self, attempt, exc):
+        delay = self.backoff(attempt)
+        retry_after = self.retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_retry_after))
+        return delay
+
+
+class CircuitBreaker:
+    """Fails fast after ``failure_threshold`` consecutive retryable failures.
+
+    After ``reset_timeout`` seconds one trial request is let through (half-open);
+    its success closes the circuit, its failure opens it again. The trial's token from
+    ``before_call`` goes back to ``release`` however the attempt ends.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial = None
+        self._trial_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError, or let the call through; returns the trial token when half-open."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return None
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial = None
+            if self.state == self.HALF_OPEN and self._trial is None:
+                self._trial = next(self._trial_ids)
+                return self._trial
+            remaining = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(f"Circuit open after {self.consecutive_failures} consecutive failures; "
+                                   f"retry in {remaining:.1f}s")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial = None
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial = None
+
+    def release(self, trial):
+        """Free the half-open trial slot if ``trial`` still holds it (no outcome was recorded)."""
+        if trial is None:
+            return
+        with self._lock:
+            if self._trial == trial:
+                self._trial = None
+
+
+_default_breaker = CircuitBreaker()
+
+
+def default_circuit_breaker():
+    """Breaker shared by every agent, since they all talk to the same endpoint."""
+    return _default_breaker
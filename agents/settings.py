@@ -0,0 +1,23 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+
+# On-disk caches (LLM responses, derived artifacts). Safe to delete at any time.
+CACHE_DIR = os.getenv("PATHWAY_CACHE_DIR", os.path.join(PROJECT_ROOT, ".cache"))
+
+# Upper bound on concurrent in-flight LLM requests from the async agent path.
+LLM_CONCURRENCY = int(os.getenv("PATHWAY_LLM_CONCURRENCY", "4"))
+
+# Identical concurrent LLM requests share one in-flight call ("0" disables).
+COALESCE_REQUESTS = os.getenv("PATHWAY_COALESCE_REQUESTS", "1") != "0"
+
+# Per-request timeout (seconds) for OpenAI calls.
+LLM_TIMEOUT = float(os.getenv("PATHWAY_LLM_TIMEOUT", "60"))
+
+# Directory holding the admission guideline PDFs (every *.pdf in it is indexed).
+GUIDELINE_DIR = os.getenv("PATHWAY_GUIDELINE_DIR", os.path.join(PROJECT_ROOT, "guideline"))
@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+from collections import deque
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_KINDS = ("prompt", "completion", "cached")
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(le, cumulative count) pairs, Prometheus style, ending with +Inf."""
+        total, out = 0, []
+        for bound, n in zip((*self.buckets, float("inf")), self.counts):
+            total += n
+            out.append((bound, total))
+        return out
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None when empty)."""
+        if not self.count:
+            return None
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.sum,
+                "buckets": {("+Inf" if b == float("inf") else b): n for b, n in self.cumulative()}}
+
+
+class Telemetry:
+    """In-process record of every LLM call: counters, latency histograms and a recent-call log.
+
+    Counters and histograms are labelled by agent. ``to_prometheus`` renders the text
+    exposition format, ``snapshot`` the same data as JSON-ready dicts.
+    """
+
+    def __init__(self, recent=1000):
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=recent)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = {}       # (agent, outcome) -> count
+            self.tokens = {}      # (agent, kind) -> count
+            self.retries = {}     # agent -> count
+            self.latency = {}     # agent -> Histogram
+            self.ttft = {}        # agent -> Histogram
+            self.recent.clear()
+            self.started = time.time()
+
+    def record(self, agent, outcome, latency, retries=0, ttft=None, prompt_tokens=None,
+               completion_tokens=None, cached_tokens=None, model=None):
+        call = {
+            "time": time.time(),
+            "agent": agent,
+            "model": model,
+            "outcome": outcome,
+            "latency": latency,
+            "ttft": ttft,
+            "retries": retries,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+        }
+        with self._lock:
+            self.calls[(agent, outcome)] = self.calls.get((agent, outcome), 0) + 1
+            self.retries[agent] = self.retries.get(agent, 0) + retries
+            for kind, n in zip(TOKEN_KINDS, (prompt_tokens, completion_tokens, cached_tokens)):
+                self.tokens[(agent, kind)] = self.tokens.get((agent, kind), 0) + (n or 0)
+            # Cache hits and coalesced calls (which waited on another call's request) are not model time.
+            if outcome not in ("cache_hit", "coalesced"):
+                self.latency.setdefault(agent, Histogram()).observe(latency)
+            if ttft is not None:
+                self.ttft.setdefault(agent, Histogram()).observe(ttft)
+            self.recent.append(call)
+        return call
+
+    def agent_summary(self):
+        """Per-agent totals, sorted by total model time so the dominant agent comes first."""
+        with self._lock:
+            agents = {a for a, _ in self.calls}
+            rows = []
+            for agent in agents:
+                by_outcome = {o: n for (a, o), n in self.calls.items() if a == agent}
+                hist = self.latency.get(agent) or Histogram()
+                rows.append({
+                    "agent": agent,
+                    "calls": sum(by_outcome.values()),
+                    "errors": sum(n for o, n in by_outcome.items() if o not in ("ok", "cache_hit", "coalesced")),
+                    "cache_hits": by_outcome.get("cache_hit", 0),
+                    "coalesced": by_outcome.get("coalesced", 0),
+                    "retries": self.retries.get(agent, 0),
+                    **{f"{k}_tokens": self.tokens.get((agent, k), 0) for k in TOKEN_KINDS},
+                    "model_seconds": hist.sum,
+                    "mean_latency": hist.sum / hist.count if hist.count else None,
+                    "p95_latency_le": hist.quantile(0.95),
+                })
+        return sorted(rows, key=lambda r: r["model_seconds"], reverse=True)
+
+    def snapshot(self):
+        with self._lock:
+            data = {
+                "started": self.started,
+                "calls": [{"agent": a, "outcome": o, "count": n} for (a, o), n in sorted(self.calls.items())],
+                "tokens": [{"agent": a, "kind": k, "count": n} for (a, k), n in sorted(self.tokens.items())],
+                "retries": dict(sorted(self.retries.items())),
+                "latency_seconds": {a: h.to_dict() for a, h in sorted(self.latency.items())},
+                "ttft_seconds": {a: h.to_dict() for a, h in sorted(self.ttft.items())},
+                "recent": list(self.recent),
+            }
+        data["agents"] = self.agent_summary()
+        return data
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self, prefix="pathway_llm"):
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def histogram(name, hists):
+            for agent, hist in sorted(hists.items()):
+                for bound, total in hist.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{prefix}_{name}_bucket{{agent="{agent}",le="{le}"}} {total}')
+                lines.append(f'{prefix}_{name}_sum{{agent="{agent}"}} {hist.sum}')
+                lines.append(f'{prefix}_{name}_count{{agent="{agent}"}} {hist.count}')
+
+        with self._lock:
+            header("calls_total", "counter", "LLM calls by agent and outcome.")
+            for (agent, outcome), n in sorted(self.calls.items()):
+                lines.append(f'{prefix}_calls_total{{agent="{agent}",outcome="{outcome}"}} {n}')
+            header("tokens_total", "counter", "Tokens by agent and kind (prompt, completion, cached).")
+            for (agent, kind), n in sorted(self.tokens.items()):
+                lines.append(f'{prefix}_tokens_total{{agent="{agent}",kind="{kind}"}} {n}')
+            header("retries_total", "counter", "Retried attempts by agent.")
+            for agent, n in sorted(self.retries.items()):
+                lines.append(f'{prefix}_retries_total{{agent="{agent}"}} {n}')
+            header("latency_seconds", "histogram", "Call latency including retries, excluding cache hits "
+                   "and coalesced calls.")
+            histogram("latency_seconds", self.latency)
+            header("ttft_seconds", "histogram", "Time to first token of streamed calls.")
+            histogram("ttft_seconds", self.ttft)
+        return "\n".join(lines) + "\n"
+
+
+_default_telemetry = Telemetry()
+
+
+def default_telemetry():
+    """Telemetry shared by every agent in the process."""
+    return _default_telemetry
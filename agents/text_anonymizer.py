@@ -1,8 +1,153 @@
 from .agent_base import AgentBase
-from presidio_analyzer import PatternRecognizer, RecognizerRegistry, AnalyzerEngine
+from .text_store import fingerprint, gazetteer_version
+from presidio_analyzer import EntityRecognizer, RecognizerRegistry, AnalyzerEngine, RecognizerResult
+from presidio_analyzer.nlp_engine import NlpEngineProvider
+from loguru import logger
+from bisect import bisect_left, insort
+import asyncio
+from collections import deque
 import os
+import threading
+import time
 
 ALLOWED_ENTITIES = ["PERSON", "LOCATION", "EMAIL_ADDRESS", "PHONE_NUMBER", "DISTRICT", "COMMUNE"] 
+# Part of the stored-output key; bump when span selection or replacement changes.
+ANONYMIZER_VERSION = 1
+
+# The spaCy model behind Presidio is the expensive part, so it is loaded once per process
+# and shared by every Text_anonymizer instance (a rebuilt AgentManager reuses it too).
+_nlp_engine = None
+_nlp_engine_lock = threading.Lock()
+
+
+def _get_nlp_engine():
+    global _nlp_engine
+    if _nlp_engine is None:
+        with _nlp_engine_lock:
+            if _nlp_engine is None:
+                start = time.perf_counter()
+                _nlp_engine = NlpEngineProvider().create_engine()
+                logger.info(f"[Anonymizer_tool] NLP engine loaded in {time.perf_counter() - start:.3f}s")
+    return _nlp_engine
+
+
+def _normalize_with_offsets(text):
+    """Lower-case ``text`` and collapse whitespace runs to one space.
+
+    Returns the normalized string and, for every normalized character, its offset
+    in the original text so matches can be mapped back.
+    """
+    chars = []
+    offsets = []
+    prev_space = False
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            if prev_space:
+                continue
+            chars.append(" ")
+            prev_space = True
+        else:
+            low = ch.lower()
+            chars.append(low if len(low) == 1 else ch)
+            prev_space = False
+        offsets.append(i)
+    return "".join(chars), offsets
+
+
+def _normalize_name(name):
+    return _normalize_with_offsets(name.strip())[0]
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+class AhoCorasickAutomaton:
+    """Multi-pattern matcher that finds every occurrence of every key in one pass over the text."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for key, payload in patterns:
+            self._add(key, payload)
+        self._build()
+
+    def _add(self, key, payload):
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(key), payload))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text):
+        """Yield ``(start, end, payload)`` for every key occurrence, overlapping ones included."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, payload in out[node]:
+                yield i + 1 - length, i + 1, payload
+
+
+class GazetteerRecognizer(EntityRecognizer):
+    """Presidio recognizer for a fixed list of place names backed by an Aho-Corasick automaton.
+
+    Matching is case-insensitive, tolerant to extra whitespace inside a name, and
+    limited to whole words, like a PatternRecognizer deny-list.
+    """
+
+    def __init__(self, names, supported_entity="LOCATION", name=None, score=1.0):
+        self.score = score
+        canonical = {}
+        for n in names:
+            key = _normalize_name(n)
+            if key:
+                canonical.setdefault(key, n.strip())
+        self._automaton = AhoCorasickAutomaton(canonical.items())
+        super().__init__(supported_entities=[supported_entity], name=name or f"Gazetteer_{supported_entity}")
+
+    def load(self):
+        pass
+
+    def analyze(self, text, entities, nlp_artifacts=None):
+        entity_type = self.supported_entities[0]
+        norm, offsets = _normalize_with_offsets(text)
+        results = []
+        for start, end, _canonical in self._automaton.iter_matches(norm):
+            if start > 0 and _is_word_char(norm[start - 1]):
+                continue
+            if end < len(norm) and _is_word_char(norm[end]):
+                continue
+            results.append(
+                RecognizerResult(
+                    entity_type=entity_type,
+                    start=offsets[start],
+                    end=offsets[end - 1] + 1,
+                    score=self.score,
+                )
+            )
+        return results
 
 
 class Text_anonymizer(AgentBase):
@@ -11,17 +156,91 @@ class Text_anonymizer(AgentBase):
         base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
         with open(os.path.join(base_dir, "district.txt"), "r") as f:
             district_names = [line.strip() for line in f if line.strip()]
-        self.district_recognizer = PatternRecognizer(supported_entity="LOCATION", deny_list=district_names)
+        self.district_recognizer = GazetteerRecognizer(district_names, supported_entity="LOCATION", name="DistrictGazetteer")
         with open(os.path.join(base_dir, "commune.txt"), "r") as f:
             commune_names = [line.strip() for line in f if line.strip()]
-        self.commune_recognizer = PatternRecognizer(supported_entity="LOCATION", deny_list=commune_names)
+        self.commune_recognizer = GazetteerRecognizer(commune_names, supported_entity="LOCATION", name="CommuneGazetteer")
+        self.cache_version = fingerprint(type(self).__name__, ANONYMIZER_VERSION, ALLOWED_ENTITIES,
+                                         gazetteer_version(district_names, commune_names))
+        self._analyzer = None
+        self._analyzer_lock = threading.Lock()
+        self.analyze_stats = {"calls": 0, "total_seconds": 0.0, "last_seconds": None}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def analyzer(self):
+        """AnalyzerEngine built on first use and reused for every later call.
+
+        AnalyzerEngine.analyze keeps no per-call state, so one instance is
+        shared between threads; only the construction is guarded.
+        """
+        if self._analyzer is None:
+            with self._analyzer_lock:
+                if self._analyzer is None:
+                    start = time.perf_counter()
+                    registry = RecognizerRegistry()
+                    registry.load_predefined_recognizers()
+                    registry.add_recognizer(self.district_recognizer)
+                    registry.add_recognizer(self.commune_recognizer)
+                    self._analyzer = AnalyzerEngine(registry=registry, nlp_engine=_get_nlp_engine())
+                    logger.info(f"[{self.name}] AnalyzerEngine built in {time.perf_counter() - start:.3f}s")
+        return self._analyzer
+
+    def warm_up(self):
+        """Build the analyzer and run one tiny analysis so the first real request pays nothing extra."""
+        start = time.perf_counter()
+        self.analyzer.analyze(text="Warm up.", language="en", entities=ALLOWED_ENTITIES)
+        elapsed = time.perf_counter() - start
+        logger.info(f"[{self.name}] Warm-up finished in {elapsed:.3f}s")
+        return elapsed
+
+    def _analyze(self, text):
+        analyzer = self.analyzer
+        start = time.perf_counter()
+        results = analyzer.analyze(text=text, language="en", entities=ALLOWED_ENTITIES)
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.analyze_stats["calls"] += 1
+            self.analyze_stats["total_seconds"] += elapsed
+            self.analyze_stats["last_seconds"] = elapsed
+        if self.verbose:
+            logger.info(f"[{self.name}] analyze took {elapsed:.3f}s for {len(text)} chars")
+        return results
+
+    def _analyze_many(self, texts, batch_size, n_process):
+        # BatchAnalyzerEngine in the pinned presidio version does not forward batch_size/n_process,
+        # so run spaCy's nlp.pipe directly and hand the artifacts to the shared analyzer.
+        analyzer = self.analyzer
+        nlp_engine = analyzer.nlp_engine
+        start = time.perf_counter()
+        docs = nlp_engine.nlp["en"].pipe(texts, batch_size=batch_size, n_process=n_process)
+        all_results = []
+        for text, doc in zip(texts, docs):
+            nlp_artifacts = nlp_engine._doc_to_nlp_artifact(doc, "en")
+            all_results.append(
+                analyzer.analyze(text=text, language="en", entities=ALLOWED_ENTITIES, nlp_artifacts=nlp_artifacts)
+            )
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.analyze_stats["calls"] += len(texts)
+            self.analyze_stats["total_seconds"] += elapsed
+            self.analyze_stats["last_seconds"] = elapsed / len(texts) if texts else 0.0
+        if self.verbose:
+            logger.info(f"[{self.name}] analyzed {len(texts)} texts in {elapsed:.3f}s (batch_size={batch_size}, n_process={n_process})")
+        return all_results
 
     def _select_best_non_overlapping(self, results):
         sorted_results = sorted(results, key=lambda r: (-r.score, -(r.end - r.start), r.start))
         chosen = []
+        # Kept spans as (start, end), ordered by start. Kept spans never overlap each other,
+        # so their ends are non-decreasing too: the last kept span starting before cand.end
+        # has the largest end of all of them, and only that one needs checking.
+        kept_spans = []
         for cand in sorted_results:
-            overlaps = any( not (cand.end <= kept.start or cand.start >= kept.end) for kept in chosen)
+            i = bisect_left(kept_spans, (cand.end,))
+            overlaps = i > 0 and kept_spans[i - 1][1] > cand.start
             if not overlaps:
+                insort(kept_spans, (cand.start, cand.end))
                 chosen.append(cand)
         return sorted(chosen, key=lambda r: r.start)
     
@@ -35,13 +254,30 @@ class Text_anonymizer(AgentBase):
         parts.append(text[cursor:])
         return "".join(parts)
 
-    def execute(self, text):
-        registry = RecognizerRegistry()
-        registry.load_predefined_recognizers()
-        registry.add_recognizer(self.district_recognizer)
-        registry.add_recognizer(self.commune_recognizer)
-        analyzer = AnalyzerEngine(registry=registry)
-        results = analyzer.analyze(text=text, language="en", entities=ALLOWED_ENTITIES)
+    def _anonymize(self, text, results):
         best = self._select_best_non_overlapping(results)
-        final_text = self._replace_with_entities(text, best)
-        return final_text
\ No newline at end of file
+        return self._replace_with_entities(text, best)
+
+    def execute(self, text):
+        results = self._analyze(text)
+        final_text = self._anonymize(text, results)
+        return final_text
+
+    def execute_many(self, texts, batch_size=32, n_process=1):
+        """Anonymize many documents, returning the anonymized texts in input order.
+
+        Tokenization and NER run through spaCy's nlp.pipe, so documents are processed
+        in batches of ``batch_size`` and, with ``n_process > 1``, across several CPU cores.
+        """
+        texts = [str(t) for t in texts]
+        if not texts:
+            return []
+        all_results = self._analyze_many(texts, batch_size=batch_size, n_process=n_process)
+        return [self._anonymize(text, results) for text, results in zip(texts, all_results)]
+
+    async def aexecute(self, text):
+        """Runs the CPU-bound analysis in a worker thread so the event loop stays responsive."""
+        return await asyncio.to_thread(self.execute, text)
+
+    async def aexecute_many(self, texts, batch_size=32, n_process=1):
+        return await asyncio.to_thread(self.execute_many, texts, batch_size, n_process)
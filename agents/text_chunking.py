@@ -0,0 +1,81 @@
+import re
+
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?…])\s+(?=\S)")
+LINE_BREAK = re.compile(r"\n\s*")
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English prose.
+    return max(1, len(text) // 4)
+
+
+def _units(text, max_tokens):
+    """(segment, separator) pairs: paragraphs, split into sentences (then lines) when too long."""
+    units = []
+    pos = 0
+    for m in list(PARAGRAPH_BREAK.finditer(text)) + [None]:
+        end = m.start() if m else len(text)
+        sep = m.group(0) if m else ""
+        paragraph = text[pos:end]
+        if estimate_tokens(paragraph) <= max_tokens:
+            units.append((paragraph, sep))
+        else:
+            units.extend(_split(paragraph, sep, (SENTENCE_BREAK, LINE_BREAK)))
+        if m:
+            pos = m.end()
+    return [(seg, sep) for seg, sep in units if seg or sep]
+
+
+def _split(paragraph, trailing_sep, patterns):
+    pattern, rest = patterns[0], patterns[1:]
+    units, pos = [], 0
+    for m in pattern.finditer(paragraph):
+        units.append((paragraph[pos:m.start()], m.group(0)))
+        pos = m.end()
+    units.append((paragraph[pos:], trailing_sep))
+    if rest and len(units) == 1:
+        return _split(paragraph, trailing_sep, rest)
+    return units
+
+
+def split_for_correction(text, max_tokens=400, overlap_tokens=60):
+    """Split ``text`` into chunks of about ``max_tokens`` on paragraph/sentence boundaries.
+
+    Each chunk is ``{"text", "sep", "context"}``: ``sep`` is the original whitespace that
+    followed it, and ``context`` is the tail of the preceding text (up to ``overlap_tokens``)
+    for the model to read but not rewrite. Joining ``text + sep`` over all chunks gives
+    back the input exactly (leading whitespace aside, kept as the first chunk's ``lead``).
+    """
+    stripped = text.lstrip()
+    lead = text[:len(text) - len(stripped)]
+    chunks, current, used = [], [], 0
+    for seg, sep in _units(stripped, max_tokens):
+        cost = estimate_tokens(seg)
+        if current and used + cost > max_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append((seg, sep))
+        used += cost
+    if current:
+        chunks.append(current)
+
+    out, previous = [], ""
+    for units in chunks:
+        raw = "".join(seg + sep for seg, sep in units[:-1]) + units[-1][0]
+        # Trailing whitespace belongs to the separator, so stripping model output loses nothing.
+        body = raw.rstrip()
+        context = previous[-overlap_tokens * 4:] if overlap_tokens else ""
+        if context and len(context) < len(previous):
+            # Start the context on a word boundary.
+            context = context.split(" ", 1)[-1]
+        out.append({"text": body, "sep": raw[len(body):] + units[-1][1], "context": context.strip(), "lead": ""})
+        previous = body
+    if out:
+        out[0]["lead"] = lead
+    return out
+
+
+def stitch(chunks, outputs):
+    """Reassemble corrected chunk texts with the original separators, in input order."""
+    return "".join(c["lead"] + out.strip() + c["sep"] for c, out in zip(chunks, outputs))
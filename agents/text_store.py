@@ -0,0 +1,43 @@
+import hashlib
+import json
+import os
+import threading
+
+from .response_cache import LRUCache, ResponseCache, SQLiteCache
+from .settings import CACHE_DIR
+
+
+def fingerprint(*parts):
+    """Short, stable hash of JSON-serializable config parts."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def gazetteer_version(*name_lists):
+    """Order-insensitive hash of gazetteer name lists; changes whenever a name is added or removed."""
+    return fingerprint([sorted({" ".join(n.split()).lower() for n in names}) for names in name_lists])
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def default_text_store():
+    """Process-wide store of stage outputs shared by every pipeline; ``PATHWAY_TEXT_STORE=0`` disables it."""
+    global _default_store
+    if os.getenv("PATHWAY_TEXT_STORE", "1") == "0":
+        return None
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = ResponseCache(
+                    memory=LRUCache(max_entries=int(os.getenv("PATHWAY_TEXT_STORE_MEMORY_ENTRIES", "512"))),
+                    disk=SQLiteCache(
+                        os.path.join(CACHE_DIR, "text_store.sqlite"),
+                        ttl_seconds=float(os.getenv("PATHWAY_TEXT_STORE_TTL", str(30 * 24 * 3600))),
+                        max_entries=int(os.getenv("PATHWAY_TEXT_STORE_DISK_ENTRIES", "5000")),
+                        # 1: purges grammar outputs stored before they were kept in memory only.
+                        version=1,
+                    ),
+                )
+    return _default_store
@@ -1,10 +1,17 @@
 
 import streamlit as st
-from agents import AgentManager
+from agents import get_agent_manager, startup_report
 from utils.logger import logger
+import hashlib
 import os
+import time
 from dotenv import load_dotenv
-from agents import PDFTextAgent
+from agents import DocumentTextAgent, IncrementalCVReview, default_response_cache, default_telemetry
+from agents.agent_base import collect_prompt_reports
+from agents.cv_recommendations import SectionStreamParser, recommendations_to_markdown
+from agents.cv_sections import segment_cv
+from agents.prompt_builder import combine_prompt_reports
+import json
 
 load_dotenv()
 
@@ -323,6 +330,7 @@ def render_nav():
         ("CV Recommender", "📄"),
         ("Grammar Tool", "📝"),
         ("Text Anonymizer", "🛡️"),
+        ("Admin", "📊"),
     ]
     st.markdown("<div class='nav-bar'>", unsafe_allow_html=True)
     cols = st.columns(len(pages))
@@ -368,7 +376,8 @@ def main():
     )
     st.markdown("</div>", unsafe_allow_html=True)
 
-    agent_manager = AgentManager(max_retries=2, verbose=True)
+    agent_manager = get_agent_manager(max_retries=2, verbose=True)
+    render_startup_report()
 
     active = render_nav()
 
@@ -381,6 +390,22 @@ def main():
         grammar_checking_section(agent_manager)
     elif active == "Text Anonymizer":
         text_anonymizer_section(agent_manager)
+    elif active == "Admin":
+        admin_section(agent_manager)
+
+
+def render_startup_report():
+    report = startup_report()
+    with st.sidebar.expander("Startup timing"):
+        if report["cold_start_seconds"] is not None:
+            st.caption(f"Cold start: {report['cold_start_seconds']:.2f}s (builds: {report['builds']})")
+        for agent_name, seconds in report["agent_build_seconds"].items():
+            st.caption(f"• {agent_name}: {seconds:.2f}s")
+        if report["last_warm_lookup_seconds"] is not None:
+            st.caption(f"Warm rerun lookup: {report['last_warm_lookup_seconds'] * 1000:.2f}ms "
+                       f"(warm lookups: {report['warm_lookups']} of {report['lookups']})")
+        if report["last_invalidation_reason"]:
+            st.caption(f"Last invalidation: {report['last_invalidation_reason']}")
 
 
 def render_home():
@@ -429,15 +454,14 @@ def grammar_checking_section(agent_manager):
         if not text.strip():
             st.warning("Please enter some text.")
             return
-        agent = agent_manager.get_agent("grammar_checker")
-        with st.spinner("Normalizing..."):
-            try:
-                normalized = _ensure_str(agent.execute(text))
-                st.markdown("##### Result")
-                st.code(normalized, language="markdown")
-            except Exception as e:
-                st.error("Error during grammar normalization.")
-                logger.error(e)
+        with st.spinner("Normalizing..."), collect_prompt_reports() as prompt_reports:
+            result = agent_manager.get_pipeline(("grammar",)).run(text)
+        if result.ok:
+            st.markdown("##### Result")
+            st.code(result.outputs["grammar"], language="markdown")
+            render_prompt_report(prompt_reports, agent_manager.get_agent("grammar_checker").name)
+        else:
+            st.error("Error during grammar normalization.")
     if col_b.button("Generate Grammar Report"):
         if not text.strip():
             st.warning("Please enter some text.")
@@ -462,19 +486,23 @@ def cv_recommender_section(agent_manager):
     left, right = st.columns([1.05, 1])
     with left:
         st.markdown("<div class='section-label'>Source Input</div>", unsafe_allow_html=True)
-        uploaded_pdf = st.file_uploader("Upload CV PDF", type=["pdf"], help="Text-based PDFs only (no scans).")
+        uploaded_doc = st.file_uploader("Upload CV (PDF or DOCX)", type=["pdf", "docx"],
+                                        help="Text-based PDFs (no scans) or Word documents.")
         extracted_text = ""
-        if uploaded_pdf:
-            temp_path = "temp_cv.pdf"
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_pdf.read())
-            with st.spinner("Extracting PDF text..."):
-                try:
-                    pdf_agent = PDFTextAgent()
-                    extracted_text = pdf_agent.extract_text(temp_path)  
-                except Exception as e:
-                    st.error("Failed to extract PDF text.")
-                    logger.error(e)
+        if uploaded_doc:
+            doc_bytes = uploaded_doc.getvalue()
+            upload_hash = hashlib.sha256(doc_bytes).hexdigest()
+            extraction_cache = st.session_state.setdefault("doc_extraction_cache", {})
+            extracted_text = extraction_cache.get(upload_hash, "")
+            if not extracted_text:
+                with st.spinner("Extracting document text..."):
+                    try:
+                        doc_agent = DocumentTextAgent()
+                        extracted_text = doc_agent.extract_text(doc_bytes, filename=uploaded_doc.name)
+                        extraction_cache[upload_hash] = extracted_text
+                    except Exception as e:
+                        st.error("Failed to extract document text.")
+                        logger.error(e)
 
         cv_input_key = "cv_raw_text"
         if cv_input_key not in st.session_state:
@@ -489,6 +517,11 @@ def cv_recommender_section(agent_manager):
         )
         st.session_state[cv_input_key] = new_text
 
+        per_section = st.checkbox("Review sections in parallel", value=True, key="cv_per_section",
+                                  help="One short request per detected CV section instead of a single long one.")
+        incremental = st.checkbox("Only re-run changed sections", value=True, key="cv_incremental",
+                                  disabled=not per_section,
+                                  help="Reuse the last run's results for sections whose text has not changed.")
         c1, c2, c3 = st.columns(3)
         run_clicked = c1.button("Run Full Pipeline")
         c2.button("Reset Input", on_click=lambda: st.session_state.update({cv_input_key:""}))
@@ -503,67 +536,82 @@ def cv_recommender_section(agent_manager):
                 st.warning("Provide CV text before running pipeline.")
                 return
 
-            grammar_agent = agent_manager.get_agent("grammar_checker")
-            anonymizer_agent = agent_manager.get_agent("text_anonymizer")
             recommender_agent = agent_manager.get_agent("cv_recommender")
-
-            grammar_corrected = None
-            anonymized = None
-            recommendations = None
-
-            #grammar
-            with st.spinner("Step 1/3: Grammar normalization"):
-                try:
-                    grammar_corrected = _ensure_str(grammar_agent.execute(raw_text))
+            pipeline = agent_manager.get_pipeline(("grammar", "anonymize"))
+            # The agent is shared between sessions, so time this session's own stream.
+            stream_timing = {}
+
+            if per_section and incremental and len(segment_cv(raw_text)) > 1:
+                texts_area = st.container()
+                st.markdown("**Structured Recommendations**")
+                sections_area = st.empty()
+                live_preview = st.empty()
+                review = IncrementalCVReview(pipeline, recommender_agent,
+                                             state=st.session_state.setdefault("cv_incremental_state", {}))
+                with st.spinner("Re-running changed sections"), collect_prompt_reports() as prompt_reports:
+                    run = incremental_recommendations(review, raw_text, sections_area, live_preview)
+                live_preview.empty()
+                grammar_corrected, anonymized = run.grammar, run.anonymized
+                with texts_area:
                     st.markdown("**Grammar‑Normalized Text**")
                     st.text_area("Normalized", grammar_corrected, height=160)
-                except Exception as e:
-                    st.error("Grammar normalization failed.")
-                    logger.error(e)
-                    return
-
-            #anonymization
-            with st.spinner("Step 2/3: Anonymizing"):
-                try:
-                    anonymized = _ensure_str(anonymizer_agent.execute(grammar_corrected))
                     st.markdown("**Anonymized Text**")
                     st.text_area("Anonymized", anonymized, height=160)
-                except Exception as e:
-                    st.error("Anonymization failed.")
-                    logger.error(e)
-                    return
-
-            #recommendations
-            with st.spinner("Step 3/3: Generating recommendations"):
-                try:
-                    recommendations = recommender_agent.execute(anonymized)
-                except Exception as e:
-                    st.error("Recommendation generation failed.")
-                    logger.error(e)
+                if not run.ok:
+                    st.error(STAGE_ERRORS[run.failed_stage])
                     return
-
-            st.markdown("**Structured Recommendations**")
-            rec_text = _ensure_str(recommendations)
-            parsed_sections = []
-            try:
-                parsed_sections = parse_cv_recommendations(rec_text)
-            except Exception as e:
-                logger.warning(f"Parsing recommendations failed: {e}")
-
-            if parsed_sections:
-                for sec in parsed_sections:
-                    exp_label = f"{'❌ Missing - ' if sec['missing'] else ''}{sec['title']}"
-                    with st.expander(exp_label, expanded=sec['missing']):
-                        st.markdown("**Original:**")
-                        st.write(sec['original'] if sec['original'].strip() else "Not present")
-                        st.markdown("**Recommended:**")
-                        st.write(sec['recommended'] if sec['recommended'].strip() else "✅ No change needed")
+                st.caption(f"Sections: {run.recomputed} recomputed, {run.reused} reused"
+                           f"{' (structure reused)' if run.structure_reused else ''} · {run.seconds:.2f}s")
+                structured = run.recommendations
+                rec_text = recommendations_to_markdown(structured)
             else:
-               
-                st.markdown(rec_text)
-
+                with st.spinner("Steps 1-2/3: Grammar normalization and anonymization"):
+                    result = pipeline.run(raw_text)
+                grammar_corrected = result.outputs.get("grammar")
+                anonymized = result.outputs.get("anonymize")
+                if grammar_corrected is not None:
+                    st.markdown("**Grammar‑Normalized Text**")
+                    st.text_area("Normalized", grammar_corrected, height=160)
+                if anonymized is not None:
+                    st.markdown("**Anonymized Text**")
+                    st.text_area("Anonymized", anonymized, height=160)
+                if not result.ok:
+                    st.error(STAGE_ERRORS[result.failed_stage])
+                    return
+                st.caption(format_stage_timings(result))
+
+                #recommendations
+                st.markdown("**Structured Recommendations**")
+                sections_area = st.empty()
+                live_preview = st.empty()
+                structured = None
+                with st.spinner("Step 3/3: Generating recommendations"), collect_prompt_reports() as prompt_reports:
+                    try:
+                        if per_section:
+                            structured = fan_out_recommendations(recommender_agent, anonymized,
+                                                                 sections_area, live_preview)
+                        else:
+                            structured = stream_structured_recommendations(recommender_agent, anonymized,
+                                                                           sections_area, live_preview, stream_timing)
+                        rec_text = recommendations_to_markdown(structured)
+                    except Exception as e:
+                        # Models or endpoints without structured output: fall back to the markdown reply.
+                        logger.warning(f"Structured recommendations failed, falling back to markdown: {e}")
+                        sections_area.empty()
+                        try:
+                            rec_text = stream_markdown_recommendations(recommender_agent, anonymized,
+                                                                       sections_area, live_preview, stream_timing)
+                        except Exception as e:
+                            st.error("Recommendation generation failed.")
+                            logger.error(e)
+                            return
+                live_preview.empty()
+
+            if "ttft" in stream_timing:
+                st.caption(f"First token after {stream_timing['ttft']:.2f}s")
+            render_prompt_report(prompt_reports, recommender_agent.name)
             
-            dl_col1, dl_col2, dl_col3 = st.columns(3)
+            dl_col1, dl_col2, dl_col3, dl_col4 = st.columns(4)
             if anonymized:
                 dl_col1.download_button(
                     "Download Anonymized",
@@ -583,6 +631,12 @@ def cv_recommender_section(agent_manager):
                     rec_text,
                     file_name="cv_recommendations.txt"
                 )
+            if structured:
+                dl_col4.download_button(
+                    "Download JSON",
+                    json.dumps(structured, ensure_ascii=False, indent=2),
+                    file_name="cv_recommendations.json"
+                )
         else:
             st.info("Run the pipeline to view outputs here.")
 
@@ -596,22 +650,13 @@ def text_anonymizer_section(agent_manager):
         if not original.strip():
             st.warning("Input required.")
             return
-        grammar_agent = agent_manager.get_agent("grammar_checker")
-        anonymizer = agent_manager.get_agent("text_anonymizer")
-        with st.spinner("Normalizing..."):
-            try:
-                norm = _ensure_str(grammar_agent.execute(original))
-            except Exception as e:
-                st.error("Grammar step failed.")
-                logger.error(e)
-                return
-        with st.spinner("Anonymizing..."):
-            try:
-                anon = _ensure_str(anonymizer.execute(norm))
-            except Exception as e:
-                st.error("Anonymization failed.")
-                logger.error(e)
-                return
+        pipeline = agent_manager.get_pipeline(("grammar", "anonymize"))
+        with st.spinner("Normalizing and anonymizing..."):
+            result = pipeline.run(original)
+        if not result.ok:
+            st.error(STAGE_ERRORS[result.failed_stage])
+            return
+        norm, anon = result.outputs["grammar"], result.outputs["anonymize"]
         st.markdown("##### Normalized")
         st.code(norm, language="markdown")
         st.markdown("##### Anonymized")
@@ -621,6 +666,191 @@ def text_anonymizer_section(agent_manager):
         st.session_state["anon_text"] = ""
 
 
+def admin_section(agent_manager):
+    st.header("Admin")
+    st.caption("LLM call telemetry for this process: tokens, latency, retries, cache hits and coalesced "
+               "calls per agent.")
+    telemetry = default_telemetry()
+    rows = telemetry.agent_summary()
+
+    calls = sum(r["calls"] for r in rows)
+    cache_hits = sum(r["cache_hits"] for r in rows)
+    m1, m2, m3, m4, m5 = st.columns(5)
+    m1.metric("LLM calls", calls)
+    m2.metric("Prompt tokens", sum(r["prompt_tokens"] for r in rows))
+    m3.metric("Completion tokens", sum(r["completion_tokens"] for r in rows))
+    m4.metric("Response cache hits", f"{cache_hits / calls:.0%}" if calls else "–")
+    m5.metric("Coalesced calls", sum(r["coalesced"] for r in rows),
+              help="Calls that shared an identical request already in flight instead of sending their own.")
+
+    st.markdown("##### Per agent (slowest first)")
+    if rows:
+        st.dataframe(rows, use_container_width=True)
+    else:
+        st.info("No LLM calls recorded yet.")
+
+    stage_rows = [
+        {"pipeline": " → ".join(stages), "stage": name, **report}
+        for stages, pipeline in agent_manager.pipelines.items()
+        for name, report in pipeline.report().items()
+    ]
+    if stage_rows:
+        st.markdown("##### Pipeline stages")
+        st.dataframe(stage_rows, use_container_width=True)
+
+    with st.expander("Recent calls"):
+        st.dataframe(list(telemetry.recent)[-50:][::-1], use_container_width=True)
+
+    response_cache = default_response_cache()
+    if response_cache is not None:
+        st.caption("Response cache: " + ", ".join(f"{k} {v:.2f}" if isinstance(v, float) else f"{k} {v}"
+                                                   for k, v in response_cache.stats().items()))
+
+    c1, c2, c3 = st.columns(3)
+    c1.download_button("Export Prometheus", telemetry.to_prometheus(), file_name="pathway_metrics.prom")
+    c2.download_button("Export JSON", telemetry.to_json(indent=2), file_name="pathway_metrics.json")
+    if c3.button("Reset telemetry"):
+        telemetry.reset()
+        st.rerun()
+
+
+STAGE_ERRORS = {
+    "grammar": "Grammar normalization failed.",
+    "anonymize": "Anonymization failed.",
+    "recommend": "Recommendation generation failed.",
+}
+
+
+def format_stage_timings(result):
+    return " · ".join(
+        f"{name}: {'cached' if name in result.cached else f'{seconds:.2f}s'}"
+        for name, seconds in result.timings.items()
+    )
+
+
+def render_prompt_report(reports, agent_name):
+    report = combine_prompt_reports(r for r in reports if r["agent"] == agent_name)
+    if report:
+        st.caption(f"Prompt: {report['static_tokens']} static + {report['dynamic_tokens']} "
+                   f"dynamic tokens, {report['cached_tokens']} served from the provider cache")
+
+
+def time_first_delta(deltas, timing):
+    """Pass ``deltas`` through, storing the seconds until the first non-empty one in ``timing["ttft"]``."""
+    timing.pop("ttft", None)
+    start = time.perf_counter()
+    for delta in deltas:
+        if delta and "ttft" not in timing:
+            timing["ttft"] = time.perf_counter() - start
+        yield delta
+
+
+def stream_structured_recommendations(recommender_agent, anonymized, sections_area, live_preview, timing):
+    """Stream the JSON reply, rendering each section as soon as its object is complete."""
+    parser = SectionStreamParser()
+    with sections_area.container():
+        for delta in time_first_delta(recommender_agent.execute(anonymized, stream=True, structured=True), timing):
+            for sec in parser.feed(delta):
+                render_recommendation_section(sec)
+            live_preview.caption(f"Receiving recommendations… {parser.sections_seen} sections so far")
+        structured = parser.close()
+        render_structure_and_rewrite(structured)
+    return structured
+
+
+def incremental_recommendations(review, raw_text, sections_area, live_preview):
+    """Run an IncrementalCVReview, filling each section's slot as it is reused or recomputed."""
+    segments = segment_cv(raw_text)
+    with sections_area.container():
+        slots = [st.empty() for _ in segments]
+        done = set()
+
+        def show(i, sec):
+            with slots[i].container():
+                render_recommendation_section(sec)
+            done.add(i)
+            live_preview.caption(f"Reviewed {len(done)}/{len(segments)} sections")
+
+        run = review.run(raw_text, on_section=show)
+        if run.ok:
+            for sec in run.recommendations["sections"][len(segments):]:
+                render_recommendation_section(sec)
+            render_structure_and_rewrite(run.recommendations)
+    return run
+
+
+def fan_out_recommendations(recommender_agent, anonymized, sections_area, live_preview):
+    """Concurrent per-section requests; each section fills its slot, in CV order, as it completes."""
+    segments = segment_cv(anonymized)
+    with sections_area.container():
+        slots = [st.empty() for _ in segments]
+        done = set()
+
+        def show(i, sec):
+            while len(slots) <= i:
+                slots.append(st.empty())
+            with slots[i].container():
+                render_recommendation_section(sec)
+            done.add(i)
+            live_preview.caption(f"Reviewed {len(done)}/{len(segments)} sections")
+
+        structured = recommender_agent.recommend_by_section(anonymized, segments=segments, on_section=show)
+        # Missing sections come from the structure call, after the detected ones.
+        for i, sec in enumerate(structured["sections"]):
+            if i not in done:
+                render_recommendation_section(sec)
+        render_structure_and_rewrite(structured)
+    return structured
+
+
+def render_structure_and_rewrite(structured):
+    if structured["suggested_structure"]:
+        st.markdown("**Suggested CV Structure:** " + " → ".join(structured["suggested_structure"]))
+    if structured["rewritten_cv"]:
+        with st.expander("Rewritten CV (placeholders preserved)"):
+            st.text_area("Rewritten CV", structured["rewritten_cv"], height=320)
+
+
+def stream_markdown_recommendations(recommender_agent, anonymized, sections_area, live_preview, timing):
+    """Plain-text mode: scrape sections out of the markdown reply as it streams."""
+    rec_parser = IncrementalRecommendationParser()
+    rendered_sections = 0
+    last_preview = 0.0
+    with sections_area.container():
+        for delta in time_first_delta(recommender_agent.execute(anonymized, stream=True), timing):
+            new_sections = rec_parser.feed(delta)
+            for sec in new_sections:
+                render_recommendation_section(sec)
+            rendered_sections += len(new_sections)
+            if time.monotonic() - last_preview > 0.15:
+                live_preview.markdown(rec_parser.pending_text())
+                last_preview = time.monotonic()
+        live_preview.empty()
+        try:
+            final_sections = rec_parser.close()
+        except Exception as e:
+            logger.warning(f"Parsing recommendations failed: {e}")
+            final_sections = []
+        for sec in final_sections:
+            render_recommendation_section(sec)
+        rendered_sections += len(final_sections)
+        if not rendered_sections:
+            st.markdown(rec_parser.text)
+    return rec_parser.text
+
+
+def render_recommendation_section(sec):
+    exp_label = f"{'❌ Missing - ' if sec['missing'] else ''}{sec['title']}"
+    with st.expander(exp_label, expanded=sec['missing']):
+        st.markdown("**Original:**")
+        st.write(sec['original'] if sec['original'].strip() else "Not present")
+        st.markdown("**Recommended:**")
+        st.write(sec['recommended'] if sec['recommended'].strip() else "✅ No change needed")
+        if sec.get('reasons'):
+            st.markdown("**Why this change:**")
+            st.markdown("\n".join(f"- {r}" for r in sec['reasons']))
+
+
 def _ensure_str(maybe):
     if isinstance(maybe, str):
         return maybe
@@ -642,11 +872,11 @@ def parse_cv_recommendations(rec_text: str):
         blk = block.strip()
         if not blk:
             continue
-        title_match = re.search(r'^\*\*(.+?)\*\*', blk)
+        title_match = re.search(r'^(?:#+\s*)?\*\*(.+?)\*\*', blk)
         if not title_match:
             continue
         title_line = title_match.group(1).strip()
-        missing = "(Missing)" in title_line
+        missing = "(Missing)" in blk.splitlines()[0]
         clean_title = title_line.replace("(Missing)", "").strip()
         orig_match = re.search(r'\*\*Original:\*\*\s*\n(.*?)(\n\*\*Recommended:\*\*|\Z)', blk, re.S)
         rec_match  = re.search(r'\*\*Recommended:\*\*\s*\n(.*)', blk, re.S)
@@ -662,6 +892,42 @@ def parse_cv_recommendations(rec_text: str):
     return sections
 
 
+SECTION_DELIMITER = re.compile(r'\n-{3,}\n')
+
+
+class IncrementalRecommendationParser:
+    """
+    Incremental variant of parse_cv_recommendations for streamed output.
+    feed() returns the sections whose closing --- line has arrived; close() parses the tail.
+    """
+    def __init__(self):
+        self._buffer = ""
+        self._closed_upto = 0
+
+    @property
+    def text(self):
+        return self._buffer
+
+    def pending_text(self):
+        return self._buffer[self._closed_upto:]
+
+    def feed(self, delta):
+        self._buffer += delta
+        sections = []
+        while True:
+            m = SECTION_DELIMITER.search(self._buffer, self._closed_upto)
+            if not m:
+                break
+            sections.extend(parse_cv_recommendations(self._buffer[self._closed_upto:m.start()]))
+            self._closed_upto = m.end()
+        return sections
+
+    def close(self):
+        tail = self._buffer[self._closed_upto:]
+        self._closed_upto = len(self._buffer)
+        return parse_cv_recommendations(tail) if tail.strip() else []
+
+
 if __name__ == "__main__":
     main()
     
@@ -0,0 +1,60 @@
+"""Sequential vs. concurrent agent calls against the local fake OpenAI server.
+
+    python -m benchmarks.bench_async_agents --docs 8 --latency 0.5 --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from .fake_openai_server import FakeOpenAIServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(latency=args.latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "fake-key"
+        os.environ["PATHWAY_RESPONSE_CACHE"] = "0"
+
+        from agents.agent_base import set_llm_concurrency
+        from agents.grammar_tool import Grammar_Checking
+
+        set_llm_concurrency(args.concurrency)
+        agent = Grammar_Checking(max_retries=1, verbose=False)
+        texts = [f"Document {i}: I has studied in Chamkar Mon." for i in range(args.docs)]
+
+        start = time.perf_counter()
+        sequential = [agent.execute(t).content for t in texts]
+        sequential_s = time.perf_counter() - start
+
+        async def run_all():
+            return await asyncio.gather(*(agent.aexecute(t) for t in texts))
+
+        server.max_in_flight = 0
+        start = time.perf_counter()
+        concurrent = [r.content for r in asyncio.run(run_all())]
+        concurrent_s = time.perf_counter() - start
+
+        async def execute_and_report(text):
+            return await asyncio.gather(agent.aexecute(text), agent.agenerate_report(text))
+
+        start = time.perf_counter()
+        asyncio.run(execute_and_report(texts[0]))
+        pair_s = time.perf_counter() - start
+
+    assert sequential == concurrent, "concurrent results differ from sequential ones"
+    print(f"docs={args.docs} latency={args.latency}s concurrency={args.concurrency}")
+    print(f"sequential execute:        {sequential_s:.2f}s")
+    print(f"concurrent aexecute:       {concurrent_s:.2f}s ({sequential_s / concurrent_s:.1f}x, "
+          f"max in flight {server.max_in_flight})")
+    print(f"execute + generate_report: {pair_s:.2f}s (one round-trip instead of two)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Monolithic vs. per-section CV recommendations: p50/p95 latency against the fake server.
+
+The fake model answers each request with JSON in the requested schema, sized like a
+real reply (sections echo their text as the recommendation; the monolithic reply also
+repeats the originals and rewrites the whole CV). Latency is ``--latency`` of fixed
+overhead plus completion tokens at ``--tokens-per-second``, with log-normal jitter so
+the percentiles mean something.
+
+    python -m benchmarks.bench_cv_fanout --runs 10 --tokens-per-second 60 --concurrency 6
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import statistics
+import time
+
+from .fake_openai_server import FakeOpenAIServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SAMPLES = sorted(glob.glob(os.path.join(ROOT, "datasets", "raws", "cv", "*")))
+SECTION_BLOCK = re.compile(r"<SECTION>\n(.*)\n</SECTION>", re.S)
+OUTLINE_ITEM = re.compile(r"^- ([^:\n]+):", re.M)
+REASONS = ["Quantify impact where possible.", "Tighten wording and keep formatting consistent."]
+
+
+def _respond(body):
+    schema = (body.get("response_format") or {}).get("json_schema", {}).get("name")
+    user = body["messages"][-1]["content"]
+    if schema == "cv_section_review":
+        return json.dumps({"recommended": SECTION_BLOCK.search(user).group(1), "reasons": REASONS})
+    if schema == "cv_structure":
+        names = OUTLINE_ITEM.findall(user)
+        return json.dumps({"suggested_structure": names + ["Skills"], "missing_sections": [
+            {"title": "Skills", "recommended": "- Python, data analysis, teamwork", "reasons": REASONS}]})
+    cv = user.split("Anonymized CV Text:\n", 1)[-1]
+    from agents.cv_sections import segment_cv
+    sections = [{"title": seg["heading"] or "Header", "missing": False, "original": seg["body"],
+                 "recommended": seg["body"], "reasons": REASONS} for seg in segment_cv(cv)]
+    return json.dumps({"sections": sections, "suggested_structure": [s["title"] for s in sections],
+                       "rewritten_cv": cv})
+
+
+def _percentiles(samples):
+    cuts = statistics.quantiles(samples, n=20, method="inclusive")
+    return statistics.median(samples), cuts[18]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.4, help="Fixed per-request overhead (s).")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--jitter", type=float, default=0.25, help="Sigma of the log-normal latency factor.")
+    parser.add_argument("--concurrency", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    def latency(body):
+        tokens = len(_respond(body)) / 4
+        return (args.latency + tokens / args.tokens_per_second) * rng.lognormvariate(0, args.jitter)
+
+    with FakeOpenAIServer(latency=latency, responder=_respond) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "fake-key"
+        os.environ["PATHWAY_RESPONSE_CACHE"] = "0"
+
+        from agents.agent_base import set_llm_concurrency
+        from agents.cv_recommender_agent import CVRecommenderAgent
+        from agents.cv_sections import segment_cv
+        from agents.document_text_agent import DocumentTextAgent
+        from agents.guideline_store import guideline_pdfs
+
+        set_llm_concurrency(args.concurrency)
+        agent = CVRecommenderAgent(guideline_pdfs(), max_retries=1, verbose=False)
+        extractor = DocumentTextAgent()
+
+        print(f"latency {args.latency}s + {args.tokens_per_second:g} tok/s (jitter σ={args.jitter}), "
+              f"concurrency {args.concurrency}, {args.runs} runs")
+        print(f"{'cv':<24} {'sections':>8} {'mono p50':>9} {'mono p95':>9} {'fan p50':>8} {'fan p95':>8} "
+              f"{'p50 gain':>9}")
+        for path in SAMPLES:
+            text = extractor.extract_text(path)
+            mono, fan = [], []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                agent.recommend(text)
+                mono.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                result = agent.recommend_by_section(text)
+                fan.append(time.perf_counter() - start)
+            assert result["rewritten_cv"], "fan-out produced no rewritten CV"
+            (m50, m95), (f50, f95) = _percentiles(mono), _percentiles(fan)
+            print(f"{os.path.basename(path):<24} {len(segment_cv(text)):>8} {m50:>9.2f} {m95:>9.2f} "
+                  f"{f50:>8.2f} {f95:>8.2f} {m50 / f50:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Extraction time for the bundled DOCX samples through the document ingestion path.
+
+Reports time to first block (streaming) and full-document time, from a path and
+from in-memory bytes as the upload widget provides them. PDF samples are listed
+alongside for comparison.
+
+    python -m benchmarks.bench_docx_ingestion --repeat 20
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from agents.document_text_agent import DocumentTextAgent
+from agents.docx_text_agent import iter_blocks
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SAMPLES = sorted(glob.glob(os.path.join(ROOT, "datasets", "raws", "*", "*.docx"))
+                 + glob.glob(os.path.join(ROOT, "datasets", "raws", "*", "*.pdf")))
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    agent = DocumentTextAgent()
+    print(f"{'document':<40} {'chars':>7} {'first ms':>9} {'path ms':>9} {'bytes ms':>9}")
+    for path in SAMPLES:
+        with open(path, "rb") as f:
+            data = f.read()
+        name = os.path.basename(path)
+        text = agent.extract_text(data, filename=name)
+        first = (_time(lambda: next(iter_blocks(path)), args.repeat)
+                 if path.endswith(".docx") else float("nan"))
+        from_path = _time(lambda: agent.extract_text(path), args.repeat)
+        from_bytes = _time(lambda: agent.extract_text(data, filename=name), args.repeat)
+        print(f"{os.path.relpath(path, ROOT):<40} {len(text):>7} {first:>9.2f} {from_path:>9.2f} "
+              f"{from_bytes:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Single-call vs. chunked grammar normalization on the SOP samples, against the fake server.
+
+The fake model "corrects" by echoing the <TEXT> block, at ``--tokens-per-second``
+after ``--latency`` of fixed overhead, and stops at the request's max_tokens like
+the real API. That makes truncation visible and lets the stitched output be
+checked against the input.
+
+    python -m benchmarks.bench_grammar_chunking --tokens-per-second 80 --concurrency 4
+"""
+import argparse
+import glob
+import os
+import re
+import time
+
+from .fake_openai_server import FakeOpenAIServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SAMPLES = sorted(glob.glob(os.path.join(ROOT, "datasets", "raws", "sop", "*")))
+TEXT_BLOCK = re.compile(r"<TEXT>\n(.*)\n</TEXT>", re.S)
+
+
+def _text_of(body):
+    match = TEXT_BLOCK.search(body["messages"][-1]["content"])
+    return match.group(1) if match else ""
+
+
+def _correct(body):
+    # chars/4 tokens, cut at max_tokens as the real endpoint would.
+    return _text_of(body)[:body.get("max_tokens", 800) * 4]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.4, help="Fixed per-request overhead (s).")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--chunk-tokens", type=int, default=400)
+    args = parser.parse_args()
+
+    def latency(body):
+        return args.latency + len(_correct(body)) / 4 / args.tokens_per_second
+
+    with FakeOpenAIServer(latency=latency, responder=_correct) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "fake-key"
+        os.environ["PATHWAY_RESPONSE_CACHE"] = "0"
+
+        from agents.agent_base import set_llm_concurrency
+        from agents.document_text_agent import DocumentTextAgent
+        from agents.grammar_tool import Grammar_Checking
+
+        set_llm_concurrency(args.concurrency)
+        agent = Grammar_Checking(max_retries=1, verbose=False, chunk_tokens=args.chunk_tokens)
+        extractor = DocumentTextAgent()
+
+        print(f"latency {args.latency}s + {args.tokens_per_second:g} tok/s, concurrency {args.concurrency}, "
+              f"chunks of ~{args.chunk_tokens} tokens")
+        print(f"{'document':<24} {'chars':>6} {'single s':>9} {'kept':>6} {'chunked s':>10} {'chunks':>7} "
+              f"{'kept':>6} {'speedup':>8}")
+        for path in SAMPLES:
+            text, _ = agent.canonicalize_places(extractor.extract_text(path))
+            start = time.perf_counter()
+            single = agent.execute(text, chunked=False).content
+            single_s = time.perf_counter() - start
+            sent = len(server.requests)
+            start = time.perf_counter()
+            chunked = agent.execute(text, chunked=True).content
+            chunked_s = time.perf_counter() - start
+            n_chunks = len(server.requests) - sent
+            assert chunked.strip() == text.strip(), "stitched output differs from the echoed input"
+            print(f"{os.path.basename(path):<24} {len(text):>6} {single_s:>9.2f} "
+                  f"{len(single) / len(text):>6.0%} {chunked_s:>10.2f} {n_chunks:>7} "
+                  f"{len(chunked) / len(text):>6.0%} {single_s / chunked_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
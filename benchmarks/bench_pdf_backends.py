@@ -0,0 +1,100 @@
+"""Throughput (pages/s) and peak memory of each PDF extraction backend.
+
+Each measurement runs in a fresh interpreter so peak RSS is per backend. Besides
+the bundled samples, ``--synthetic-pages N`` builds an N-page PDF from them to
+exercise the parallel page extraction.
+
+    python -m benchmarks.bench_pdf_backends --synthetic-pages 200
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SAMPLES = sorted(glob.glob(os.path.join(ROOT, "datasets", "raws", "*", "*.pdf"))
+                 + glob.glob(os.path.join(ROOT, "guideline", "*.pdf")))
+
+
+def _worker(backend_name, path, repeat, parallel_threshold):
+    import resource
+    import time
+    from agents.pdf_backends import extract_pages, get_backend
+
+    backend = get_backend(backend_name)
+    # Importing the agents package already loads spaCy/Presidio; report growth above that too.
+    baseline_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pages = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        pages += len(extract_pages(path, backend=backend, parallel_threshold=parallel_threshold))
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux; children covers the process pool used for parallel extraction.
+    peak_kib = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    print(json.dumps({"pages": pages, "seconds": elapsed, "peak_mib": peak_kib / 1024,
+                      "delta_mib": max(0, peak_kib - baseline_kib) / 1024}))
+
+
+def _measure(backend_name, path, repeat, parallel_threshold):
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_pdf_backends", "--worker", backend_name, path,
+         str(repeat), str(parallel_threshold)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _synthetic_pdf(n_pages):
+    import fitz
+
+    out = fitz.open()
+    sources = [fitz.open(p) for p in SAMPLES]
+    while out.page_count < n_pages:
+        for src in sources:
+            out.insert_pdf(src)
+    while out.page_count > n_pages:
+        out.delete_page(-1)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    out.save(path)
+    return path
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        _worker(sys.argv[2], sys.argv[3], int(sys.argv[4]), int(sys.argv[5]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["pymupdf", "pdfplumber"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--synthetic-pages", type=int, default=0)
+    args = parser.parse_args()
+
+    cases = [(os.path.relpath(p, ROOT), p, args.repeat, 0) for p in SAMPLES]
+    synthetic = None
+    if args.synthetic_pages:
+        synthetic = _synthetic_pdf(args.synthetic_pages)
+        label = f"synthetic {args.synthetic_pages}p"
+        cases.append((f"{label} (serial)", synthetic, 1, 0))
+        cases.append((f"{label} (parallel)", synthetic, 1, 1))
+
+    print(f"CPUs available: {os.cpu_count()} (parallel extraction needs more than one)")
+    print(f"{'document':<46} {'backend':<11} {'pages/s':>9} {'peak MiB':>9} {'+MiB':>7}")
+    try:
+        for label, path, repeat, threshold in cases:
+            for backend in args.backends:
+                r = _measure(backend, path, repeat, threshold)
+                print(f"{label:<46} {backend:<11} {r['pages'] / r['seconds']:>9.1f} {r['peak_mib']:>9.1f} "
+                      f"{r['delta_mib']:>7.1f}")
+    finally:
+        if synthetic:
+            os.remove(synthetic)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Serves ``POST /v1/chat/completions`` with a configurable delay so agents can be
+exercised and benchmarked without network access or API cost:
+
+    with FakeOpenAIServer(latency=0.5) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "test"
+        ...
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def echo_responder(body):
+    """Default reply: the last user message, so outputs are deterministic and distinguishable."""
+    user_messages = [m["content"] for m in body.get("messages", []) if m.get("role") == "user"]
+    return f"echo: {user_messages[-1] if user_messages else ''}"
+
+
+class FakeOpenAIServer:
+    def __init__(self, latency=0.2, responder=None, host="127.0.0.1", port=0,
+                 fail_statuses=(), retry_after=None, token_delay=0.0):
+        self.latency = latency
+        # For stream=True requests: ``latency`` is the time to first token, then one word per token_delay.
+        self.token_delay = token_delay
+        self.responder = responder or echo_responder
+        # Status codes returned, in order, by the first requests (e.g. [429, 503]) before succeeding.
+        self.fail_statuses = list(fail_statuses)
+        self.retry_after = retry_after
+        self.requests = []
+        self._prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _delay_for(self, body):
+        return self.latency(body) if callable(self.latency) else self.latency
+
+    def _usage(self, body, content):
+        """Token counts (chars/4) with provider-style prefix caching.
+
+        Like OpenAI, the longest prefix shared with an earlier prompt counts as cached,
+        in 128-token steps, once it reaches 1024 tokens.
+        """
+        prompt = "".join(f"{m.get('role')}:{m.get('content', '')}\n" for m in body.get("messages", []))
+        with self._lock:
+            shared = max((len(os.path.commonprefix([prompt, p])) for p in self._prompts), default=0)
+            self._prompts.append(prompt)
+        prompt_tokens = len(prompt) // 4
+        shared_tokens = shared // 4
+        cached = shared_tokens // 128 * 128 if shared_tokens >= 1024 else 0
+        completion_tokens = len(content) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, body, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                words = content.split(" ")
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(server.token_delay)
+                    chunk = {
+                        "id": "chatcmpl-fake-stream",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": word if i == 0 else " " + word},
+                            "finish_reason": None,
+                        }],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    chunk = {
+                        "id": "chatcmpl-fake-stream",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [],
+                        "usage": server._usage(body, content),
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests.append(body)
+                    fail_status = server.fail_statuses.pop(0) if server.fail_statuses else None
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    if fail_status is not None:
+                        headers = {"Retry-After": str(server.retry_after)} if server.retry_after is not None else {}
+                        self._send_json(fail_status, {"error": {"message": f"injected {fail_status}"}}, headers)
+                        return
+                    time.sleep(server._delay_for(body))
+                    content = server.responder(body)
+                    if body.get("stream"):
+                        self._send_stream(body, content)
+                        return
+                    self._send_json(200, {
+                        "id": f"chatcmpl-fake-{len(server.requests)}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{
+                            "index": 0,
+                            "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": content},
+                        }],
+                        "usage": server._usage(body, content),
+                    })
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
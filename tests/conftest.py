@@ -0,0 +1,53 @@
+import openai
+import pytest
+
+from agents import agent_base
+from agents.agent_base import AgentBase
+from agents.retry_policy import CircuitBreaker
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+
+class EchoAgent(AgentBase):
+    """Sends ``text`` as the user message; the fake server echoes it back."""
+
+    def messages(self, text):
+        return [{"role": "system", "content": "Repeat the text."}, {"role": "user", "content": text}]
+
+    def execute(self, text, **kwargs):
+        return self.call_openai(self.messages(text), **kwargs)
+
+    async def aexecute(self, text, **kwargs):
+        return await self.acall_openai(self.messages(text), **kwargs)
+
+
+@pytest.fixture
+def echo_agent():
+    """``echo_agent(**kwargs)`` builds a quiet EchoAgent with one attempt per call and its own breaker."""
+
+    def make(**kwargs):
+        kwargs.setdefault("max_retries", 1)
+        kwargs.setdefault("circuit_breaker", CircuitBreaker())
+        return EchoAgent("echo", verbose=False, **kwargs)
+
+    return make
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """``fake_openai(**kwargs)`` starts a FakeOpenAIServer and points fresh, uncached clients at it."""
+    servers = []
+
+    def start(**kwargs):
+        server = FakeOpenAIServer(**kwargs).start()
+        servers.append(server)
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        monkeypatch.setenv("PATHWAY_RESPONSE_CACHE", "0")
+        monkeypatch.setattr(openai, "api_key", "test")
+        monkeypatch.setattr(agent_base, "_sync_client", None)
+        agent_base._async_clients.clear()
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
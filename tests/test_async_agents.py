@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from agents import settings
+from agents.agent_base import set_llm_concurrency
+from agents.grammar_tool import Grammar_Checking
+
+
+@pytest.fixture
+def concurrency(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CONCURRENCY", settings.LLM_CONCURRENCY)
+    return set_llm_concurrency
+
+
+def test_aexecute_returns_reply(fake_openai, echo_agent):
+    server = fake_openai(latency=0.01)
+    assert asyncio.run(echo_agent().aexecute("hello")).content == "echo: hello"
+    assert len(server.requests) == 1
+
+
+def test_aexecute_matches_execute(fake_openai, echo_agent):
+    fake_openai(latency=0.01)
+    agent = echo_agent()
+    assert asyncio.run(agent.aexecute("same")).content == agent.execute("same").content
+
+
+def test_concurrent_calls_respect_the_semaphore(fake_openai, echo_agent, concurrency):
+    server = fake_openai(latency=0.2)
+    concurrency(2)
+    agent = echo_agent()
+
+    async def run_all():
+        return await asyncio.gather(*(agent.aexecute(f"doc {i}") for i in range(6)))
+
+    assert [r.content for r in asyncio.run(run_all())] == [f"echo: doc {i}" for i in range(6)]
+    assert len(server.requests) == 6
+    assert server.max_in_flight == 2
+
+
+def test_set_llm_concurrency_rejects_zero(concurrency):
+    with pytest.raises(ValueError):
+        concurrency(0)
+
+
+def test_grammar_aexecute_matches_execute(fake_openai, concurrency):
+    server = fake_openai(latency=0.05)
+    concurrency(2)
+    agent = Grammar_Checking(max_retries=1, verbose=False)
+    texts = [f"Document {i}: I has studied in Chamkar Mon." for i in range(5)]
+    expected = [agent.execute(t).content for t in texts]
+
+    async def run_all():
+        return await asyncio.gather(*(agent.aexecute(t) for t in texts))
+
+    server.max_in_flight = 0
+    assert [r.content for r in asyncio.run(run_all())] == expected
+    assert server.max_in_flight == 2
+
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+
+from agents import settings
+from agents.response_cache import LRUCache, ResponseCache
+
+
+class LandedMeanwhileCache(ResponseCache):
+    """Misses the first lookup, as if an identical call stored its reply right after it."""
+
+    def __init__(self, reply):
+        super().__init__(memory=LRUCache(max_entries=8))
+        self.reply = reply
+        self.lookups = 0
+
+    def get(self, key):
+        self.lookups += 1
+        if self.lookups == 2:
+            self.set(key, self.reply)
+        return super().get(key)
+
+
+def _run_together(agent, texts, mode):
+    """Contents of ``texts`` sent at once, from threads or as asyncio tasks."""
+    if mode == "async":
+        async def burst():
+            return await asyncio.gather(*(agent.aexecute(t) for t in texts))
+
+        return [r.content for r in asyncio.run(burst())]
+    replies = [None] * len(texts)
+
+    def run(i):
+        replies[i] = agent.execute(texts[i]).content
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(texts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return replies
+
+
+@pytest.mark.parametrize("mode", ["threads", "async"])
+def test_identical_calls_share_one_request(fake_openai, echo_agent, mode):
+    server = fake_openai(latency=0.3)
+    assert _run_together(echo_agent(), ["same"] * 5, mode) == ["echo: same"] * 5
+    assert len(server.requests) == 1
+
+
+def test_different_calls_are_not_coalesced(fake_openai, echo_agent):
+    server = fake_openai(latency=0.1)
+    _run_together(echo_agent(), [f"doc {i}" for i in range(3)], "async")
+    assert len(server.requests) == 3
+
+
+@pytest.mark.parametrize("mode", ["threads", "async"])
+def test_follower_runs_its_own_call_after_the_timeout(fake_openai, echo_agent, monkeypatch, mode):
+    server = fake_openai(latency=0.4)
+    agent = echo_agent()
+    monkeypatch.setattr(settings, "LLM_TIMEOUT", 0.05)
+    assert _run_together(agent, ["same"] * 2, mode) == ["echo: same"] * 2
+    assert len(server.requests) == 2
+
+
+@pytest.mark.parametrize("mode", ["sync", "stream", "async"])
+def test_leader_rechecks_the_cache_after_take_off(fake_openai, echo_agent, mode):
+    server = fake_openai(latency=0.0)
+    cache = LandedMeanwhileCache({"role": "assistant", "content": "stored meanwhile"})
+    agent = echo_agent(cache=cache)
+    if mode == "sync":
+        content = agent.execute("same").content
+    elif mode == "stream":
+        content = "".join(agent.execute("same", stream=True))
+    else:
+        content = asyncio.run(agent.aexecute("same")).content
+    assert content == "stored meanwhile"
+    assert cache.lookups == 2
+    assert server.requests == []
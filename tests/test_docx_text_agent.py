@@ -0,0 +1,31 @@
+import io
+
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+from agents.docx_text_agent import iter_blocks
+
+
+def _docx_bytes(document):
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def test_content_controls_are_read_in_body_order():
+    document = Document()
+    name = document.add_paragraph("Jane Doe")
+    document.add_paragraph("Experience")
+    name._p.addnext(parse_xml(
+        f"<w:sdt {nsdecls('w')}><w:sdtPr/><w:sdtContent>"
+        "<w:p><w:r><w:t>Education</w:t></w:r></w:p>"
+        "<w:sdt><w:sdtContent><w:p><w:r><w:t>BSc 2020</w:t></w:r></w:p></w:sdtContent></w:sdt>"
+        "<w:tbl><w:tblGrid><w:gridCol/><w:gridCol/></w:tblGrid>"
+        "<w:tr><w:tc><w:p><w:r><w:t>Khmer</w:t></w:r></w:p></w:tc>"
+        "<w:tc><w:p><w:r><w:t>native</w:t></w:r></w:p></w:tc></w:tr></w:tbl>"
+        "</w:sdtContent></w:sdt>"
+    ))
+    assert [b for b in iter_blocks(_docx_bytes(document)) if b] == [
+        "Jane Doe", "Education", "BSc 2020", "Khmer | native", "Experience",
+    ]
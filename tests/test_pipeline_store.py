@@ -0,0 +1,25 @@
+from agents.grammar_tool import Grammar_Checking
+from agents.pipeline import Pipeline, Stage
+from agents.response_cache import LRUCache, ResponseCache, SQLiteCache
+
+
+class RawTextAgent:
+    persist_responses = False
+    cache_version = "raw:1"
+
+    def execute(self, text):
+        return text.upper()
+
+
+def test_non_persisted_stage_stays_in_memory(tmp_path):
+    store = ResponseCache(memory=LRUCache(max_entries=8), disk=SQLiteCache(str(tmp_path / "store.sqlite")))
+    pipeline = Pipeline([Stage.from_agent("grammar", RawTextAgent()),
+                         Stage("anonymize", lambda text: text.replace("JANE", "<PERSON>"), version="a:1")],
+                        cache=store)
+    assert pipeline.run("jane").output == "<PERSON>"
+    assert len(store.disk) == 1
+    assert pipeline.run("jane").cached == ["grammar", "anonymize"]
+
+
+def test_grammar_stage_is_not_persisted():
+    assert Stage.from_agent("grammar", Grammar_Checking(max_retries=1, verbose=False)).persist is False
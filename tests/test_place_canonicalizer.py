@@ -0,0 +1,32 @@
+import pytest
+
+from agents.grammar_tool import PlaceNameCanonicalizer, _load_list
+
+
+@pytest.fixture(scope="module")
+def canonicalizer():
+    return PlaceNameCanonicalizer(_load_list("district.txt"), _load_list("commune.txt"))
+
+
+@pytest.mark.parametrize("text", [
+    "By this I mean they were great.",
+    "We mean they should come.",
+    "They mean chai tea, not coffee.",
+    "The Olympics were held in summer.",
+])
+def test_ordinary_prose_is_untouched(canonicalizer, text):
+    assert canonicalizer.canonicalize(text) == (text, [])
+
+
+def test_capitalized_typo_is_corrected(canonicalizer):
+    corrected, changes = canonicalizer.canonicalize("I live in Mean Chei.")
+    assert corrected == "I live in Mean Chey."
+    assert [c["canonical"] for c in changes] == ["Mean Chey"]
+
+
+def test_lowercase_exact_name_is_capitalized(canonicalizer):
+    assert canonicalizer.canonicalize("I live in mean chey.")[0] == "I live in Mean Chey."
+
+
+def test_lowercase_fuzzy_run_is_not_rewritten(canonicalizer):
+    assert canonicalizer.canonicalize("i live in mean chei.")[0] == "i live in mean chei."
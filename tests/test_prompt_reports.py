@@ -0,0 +1,45 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.agent_base import collect_prompt_reports, in_context
+from agents.grammar_tool import Grammar_Checking
+from agents.prompt_builder import combine_prompt_reports
+
+
+def test_reports_are_collected_per_context_including_workers(fake_openai, echo_agent):
+    fake_openai(latency=0.05)
+    agent = echo_agent()
+    collected = {}
+
+    def session(name, calls):
+        with collect_prompt_reports() as reports:
+            with ThreadPoolExecutor(max_workers=calls) as pool:
+                futures = [pool.submit(in_context(agent.execute), f"{name} {i}") for i in range(calls)]
+                for future in futures:
+                    future.result()
+        collected[name] = reports
+
+    sessions = [threading.Thread(target=session, args=(name, calls)) for name, calls in (("a", 2), ("b", 3))]
+    for t in sessions:
+        t.start()
+    for t in sessions:
+        t.join()
+    assert [len(collected["a"]), len(collected["b"])] == [2, 3]
+    assert all(r["agent"] == "echo" for r in collected["a"] + collected["b"])
+    assert combine_prompt_reports(collected["b"])["prompt_tokens"] == sum(r["prompt_tokens"] for r in collected["b"])
+
+
+def test_grammar_chunk_calls_report_to_the_caller(fake_openai):
+    server = fake_openai(latency=0.05)
+    agent = Grammar_Checking(max_retries=1, verbose=False, chunk_tokens=40, chunk_overlap_tokens=0)
+    text = "\n\n".join(f"Paragraph {i} has a few short sentences. It keeps going for a while." for i in range(4))
+    with collect_prompt_reports() as reports:
+        agent.execute(text, chunked=True)
+    assert len(server.requests) > 1
+    assert len(reports) == len(server.requests)
+
+
+def test_combine_ignores_calls_that_did_not_reach_the_api():
+    reports = [{"source": "response_cache", "static_tokens": 5, "dynamic_tokens": 5, "prompt_tokens": None,
+                "cached_tokens": 0, "completion_tokens": None}]
+    assert combine_prompt_reports(reports) is None
@@ -0,0 +1,44 @@
+from agents.grammar_tool import Grammar_Checking
+from agents.response_cache import LRUCache, ResponseCache, SQLiteCache
+
+
+def _cache(tmp_path):
+    return ResponseCache(memory=LRUCache(max_entries=8), disk=SQLiteCache(str(tmp_path / "responses.sqlite")))
+
+
+def test_set_reaches_both_tiers(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set("k", {"content": "text"})
+    assert len(cache.disk) == 1
+    cache.memory = None
+    assert cache.get("k") == {"content": "text"}
+
+
+def test_persist_false_stays_in_memory(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set("k", {"content": "Jane Doe, 012 345 678"}, persist=False)
+    assert cache.get("k") == {"content": "Jane Doe, 012 345 678"}
+    assert len(cache.disk) == 0
+
+
+def test_newer_version_drops_older_rows(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    SQLiteCache(path).set("k", {"content": "old"})
+    assert len(SQLiteCache(path, version=1)) == 0
+    SQLiteCache(path, version=1).set("k", {"content": "new"})
+    assert SQLiteCache(path, version=1).get("k") == {"content": "new"}
+
+
+def test_grammar_replies_are_never_persisted():
+    assert Grammar_Checking.persist_responses is False
+
+
+def test_agent_replies_reach_disk_only_when_persisted(fake_openai, echo_agent, tmp_path):
+    fake_openai(latency=0.0)
+    caches = [_cache(tmp_path / str(i)) for i in range(2)]
+    persisted, raw = echo_agent(cache=caches[0]), echo_agent(cache=caches[1])
+    raw.persist_responses = False
+    persisted.execute("text")
+    raw.execute("Jane Doe, 012 345 678")
+    assert len(caches[0].disk) == 1
+    assert len(caches[1].disk) == 0 and len(caches[1].memory) == 1
@@ -0,0 +1,84 @@
+import asyncio
+
+import openai
+import pytest
+
+from agents.retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+def _tripped_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+@pytest.fixture
+def breaker_agent(echo_agent):
+    return lambda breaker, **kwargs: echo_agent(circuit_breaker=breaker, retry_policy=RetryPolicy(base_delay=0.0),
+                                                **kwargs)
+
+
+def test_half_open_admits_one_trial_until_released():
+    breaker = _tripped_breaker()
+    trial = breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.release(trial)
+    assert breaker.before_call() is not None
+
+
+def test_stale_release_does_not_free_a_newer_trial():
+    breaker = _tripped_breaker()
+    first = breaker.before_call()
+    breaker.record_failure()
+    second = breaker.before_call()
+    breaker.release(first)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.release(second)
+
+
+def test_retryable_failures_open_the_breaker(fake_openai, breaker_agent):
+    server = fake_openai(latency=0.0, fail_statuses=[503, 503])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60.0)
+    with pytest.raises(Exception):
+        breaker_agent(breaker, max_retries=2).execute("down")
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker_agent(breaker).execute("down")
+    assert len(server.requests) == 2
+
+
+def test_non_retryable_trial_closes_the_breaker(fake_openai, breaker_agent):
+    fake_openai(latency=0.0, fail_statuses=[400])
+    breaker = _tripped_breaker()
+    agent = breaker_agent(breaker)
+    with pytest.raises(openai.BadRequestError):
+        agent.execute("bad")
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert agent.execute("good").content == "echo: good"
+
+
+def test_stream_closed_early_releases_the_trial(fake_openai, breaker_agent):
+    fake_openai(latency=0.0)
+    breaker = _tripped_breaker()
+    deltas = breaker_agent(breaker).execute("one two three", stream=True)
+    next(deltas)
+    deltas.close()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.before_call() is not None
+
+
+def test_cancelled_async_trial_releases_the_trial(fake_openai, breaker_agent):
+    fake_openai(latency=1.0)
+    breaker = _tripped_breaker()
+
+    async def cancelled_call():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(breaker_agent(breaker).aexecute("slow"), timeout=0.1)
+
+    asyncio.run(cancelled_call())
+    assert breaker.before_call() is not None